@@ -0,0 +1,126 @@
+"""
+Gateway Benchmark
+Compares per-request httpx clients (previous behaviour) with the gateway's
+pooled per-backend clients, against a local stub backend.
+
+Usage:
+    python benchmark_gateway.py --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+from typing import List
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def create_stub_backend(delay: float) -> FastAPI:
+    """Backend answering every route with a small JSON payload"""
+    stub = FastAPI()
+
+    @stub.post("/{path:path}")
+    async def handle(path: str, request: Request):
+        await request.body()
+        if delay:
+            await asyncio.sleep(delay)
+        return {"products": [], "query_time": 0.0, "total_matches": 0}
+
+    return stub
+
+def create_baseline_gateway(backend_url: str) -> FastAPI:
+    """The old forwarding path: a new AsyncClient (and TCP connection) per request"""
+    baseline = FastAPI()
+
+    @baseline.post("/api/v1/search")
+    async def search(request: Request):
+        body = await request.json()
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            response = await client.post(f"{backend_url}/search", json=body)
+            response.raise_for_status()
+            return response.json()
+
+    return baseline
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def load(url: str, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        async def worker():
+            nonlocal errors
+            for _ in counter:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"imageUrl": "https://example.com/look.png"})
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else 0.0,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else 0.0,
+        "rps": len(latencies) / elapsed,
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request vs pooled backend clients")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--backend-delay-ms", type=float, default=0.0, help="simulated backend latency")
+    args = parser.parse_args()
+
+    backend_port = free_port()
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    serve(create_stub_backend(args.backend_delay_ms / 1000), backend_port)
+
+    # The gateway reads backend URLs at import time; its response cache is
+    # disabled so every pooled request reaches the backend like the baseline's
+    os.environ["SEARCH_ENGINE_SERVICE"] = backend_url
+    os.environ["GATEWAY_CACHE_MAX_BYTES"] = "0"
+    import main as gateway
+
+    baseline_port, pooled_port = free_port(), free_port()
+    serve(create_baseline_gateway(backend_url), baseline_port)
+    serve(gateway.app, pooled_port)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, backend delay {args.backend_delay_ms} ms")
+    print(f"{'mode':<12} {'p50 ms':<10} {'p99 ms':<10} {'rps':<10} {'errors':<6}")
+    for mode, port in [("per-request", baseline_port), ("pooled", pooled_port)]:
+        url = f"http://127.0.0.1:{port}/api/v1/search"
+        asyncio.run(load(url, min(200, args.requests), args.concurrency))  # warm-up
+        r = asyncio.run(load(url, args.requests, args.concurrency))
+        print(f"{mode:<12} {r['p50_ms']:<10.2f} {r['p99_ms']:<10.2f} {r['rps']:<10.0f} {r['errors']:<6}")
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,132 @@ API Gateway for StyleGenie
 Routes requests to appropriate microservices
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
+import importlib.util
+import json
 import os
-from typing import Optional
+from typing import Awaitable, AsyncIterator, Callable, Dict, Optional
+import asyncio
 import logging
+import math
+import time
+
+from resilience import AdaptiveLimiter, BackendClientError, BackendUnavailable, CircuitBreaker, Hedger
+from response_cache import CachedResponse, ResponseCache, canonical_key
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Service URLs (from environment or defaults)
+IMAGE_GENERATION_SERVICE = os.getenv("IMAGE_GENERATION_SERVICE", "http://localhost:8001")
+SEARCH_ENGINE_SERVICE = os.getenv("SEARCH_ENGINE_SERVICE", "http://localhost:8002")
+ATELIER_MATCHING_SERVICE = os.getenv("ATELIER_MATCHING_SERVICE", "http://localhost:8003")
+
+BACKENDS = {
+    "image-generation": IMAGE_GENERATION_SERVICE,
+    "search-engine": SEARCH_ENGINE_SERVICE,
+    "atelier-matching": ATELIER_MATCHING_SERVICE,
+}
+
+# Connection pool per backend
+POOL_MAX_CONNECTIONS = int(os.getenv("GATEWAY_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("GATEWAY_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_POOL_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 needs a backend that speaks it (e.g. behind a TLS proxy); `h2` comes with httpx[http2]
+HTTP2_ENABLED = os.getenv("GATEWAY_HTTP2", "false").lower() == "true"
+
+# Per-route timeouts in seconds
+ROUTE_TIMEOUTS = {
+    "generate": float(os.getenv("GATEWAY_TIMEOUT_GENERATE", "60")),
+    "search": float(os.getenv("GATEWAY_TIMEOUT_SEARCH", "30")),
+    "match": float(os.getenv("GATEWAY_TIMEOUT_MATCH", "30")),
+    "jobs": float(os.getenv("GATEWAY_TIMEOUT_JOBS", "30")),
+}
+
+# Response cache: total size (0 disables) and per-route TTLs in seconds.
+# Generation is only cached when the request has an explicit seed (deterministic output).
+CACHE_MAX_BYTES = int(os.getenv("GATEWAY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("GATEWAY_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+CACHE_TTLS = {
+    "generate": float(os.getenv("GATEWAY_CACHE_TTL_GENERATE", "86400")),
+    "search": float(os.getenv("GATEWAY_CACHE_TTL_SEARCH", "300")),
+    "match": float(os.getenv("GATEWAY_CACHE_TTL_MATCH", "300")),
+}
+
+# Circuit breaker per backend: opens after N consecutive failures (connection
+# errors, timeouts, 5xx) and lets a probe through after the recovery timeout
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("GATEWAY_BREAKER_FAILURES", "5"))
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv("GATEWAY_BREAKER_RECOVERY", "30"))
+
+# Adaptive concurrency limit per route (upper bound; requests over the current
+# limit get 429) and the latency above which the limit backs off, in seconds
+CONCURRENCY_LIMITS = {
+    "generate": int(os.getenv("GATEWAY_LIMIT_GENERATE", "16")),
+    "search": int(os.getenv("GATEWAY_LIMIT_SEARCH", "100")),
+    "match": int(os.getenv("GATEWAY_LIMIT_MATCH", "100")),
+    "jobs": int(os.getenv("GATEWAY_LIMIT_JOBS", "200")),
+}
+LATENCY_TARGETS = {
+    "generate": float(os.getenv("GATEWAY_LATENCY_TARGET_GENERATE", "30")),
+    "search": float(os.getenv("GATEWAY_LATENCY_TARGET_SEARCH", "2")),
+    "match": float(os.getenv("GATEWAY_LATENCY_TARGET_MATCH", "2")),
+    "jobs": float(os.getenv("GATEWAY_LATENCY_TARGET_JOBS", "2")),
+}
+
+# Hedged requests: after this many seconds without a response, send a second
+# copy and take the first success (0 disables). Idempotent routes only.
+HEDGE_DELAYS = {
+    "search": float(os.getenv("GATEWAY_HEDGE_DELAY_SEARCH", "0")),
+    "match": float(os.getenv("GATEWAY_HEDGE_DELAY_MATCH", "0")),
+}
+
+def create_clients() -> Dict[str, httpx.AsyncClient]:
+    """One long-lived client (and connection pool) per backend"""
+    http2 = HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+    if HTTP2_ENABLED and not http2:
+        logger.warning("GATEWAY_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+    limits = httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY
+    )
+    return {
+        name: httpx.AsyncClient(base_url=url, limits=limits, http2=http2, timeout=30.0)
+        for name, url in BACKENDS.items()
+    }
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.clients = create_clients()
+    app.state.response_cache = (
+        ResponseCache(max_bytes=CACHE_MAX_BYTES, max_entry_bytes=CACHE_MAX_ENTRY_BYTES)
+        if CACHE_MAX_BYTES > 0 else None
+    )
+    app.state.breakers = {
+        name: CircuitBreaker(name, failure_threshold=BREAKER_FAILURE_THRESHOLD, recovery_timeout=BREAKER_RECOVERY_TIMEOUT)
+        for name in BACKENDS
+    }
+    app.state.limiters = {
+        route: AdaptiveLimiter(route, initial_limit=limit, max_limit=limit, latency_target=LATENCY_TARGETS[route])
+        for route, limit in CONCURRENCY_LIMITS.items()
+    }
+    app.state.hedgers = {route: Hedger(delay) for route, delay in HEDGE_DELAYS.items() if delay > 0}
+    try:
+        yield
+    finally:
+        for client in app.state.clients.values():
+            await client.aclose()
+
 app = FastAPI(
     title="StyleGenie API Gateway",
     description="API Gateway for StyleGenie fashion application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -29,10 +140,190 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Service URLs (from environment or defaults)
-IMAGE_GENERATION_SERVICE = os.getenv("IMAGE_GENERATION_SERVICE", "http://localhost:8001")
-SEARCH_ENGINE_SERVICE = os.getenv("SEARCH_ENGINE_SERVICE", "http://localhost:8002")
-ATELIER_MATCHING_SERVICE = os.getenv("ATELIER_MATCHING_SERVICE", "http://localhost:8003")
+SERVICE_NAMES = {
+    "image-generation": "Image generation service",
+    "search-engine": "Search engine service",
+    "atelier-matching": "Atelier matching service",
+}
+
+# Connection-level headers that must not be forwarded by a proxy
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade", "host",
+}
+
+@app.exception_handler(BackendUnavailable)
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailable):
+    headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after is not None else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=headers)
+
+def get_client(request: Request, backend: str) -> httpx.AsyncClient:
+    return request.app.state.clients[backend]
+
+# Set by the gateway's own server, forwarding them would duplicate them
+SERVER_HEADERS = {"date", "server"}
+
+def forward_headers(headers, skip=frozenset()) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in skip}
+
+def build_upstream_request(
+    request: Request,
+    backend: str,
+    path: str,
+    route: str,
+    body: Optional[bytes] = None
+) -> httpx.Request:
+    return get_client(request, backend).build_request(
+        request.method,
+        path,
+        params=request.query_params,
+        headers=forward_headers(request.headers),
+        content=request.stream() if body is None else body,
+        timeout=ROUTE_TIMEOUTS[route]
+    )
+
+async def call_upstream(
+    request: Request,
+    backend: str,
+    route: str,
+    attempt: Callable[[], Awaitable],
+    hedge: bool = False
+):
+    """
+    Run a backend call under the backend's circuit breaker and the route's
+    adaptive concurrency limit, hedged when enabled for the route.
+    Connection errors, timeouts and 5xx responses count as failures (4xx
+    responses are returned as-is and count as successes);
+    rejections and transport failures raise BackendUnavailable (503, or 429 when shedding load).
+    """
+    breaker: CircuitBreaker = request.app.state.breakers[backend]
+    limiter: AdaptiveLimiter = request.app.state.limiters[route]
+    if not breaker.allow():
+        raise BackendUnavailable(503, f"{SERVICE_NAMES[backend]} unavailable", retry_after=breaker.retry_after())
+    if not limiter.try_acquire():
+        breaker.release_probe()
+        raise BackendUnavailable(429, "Too many requests", retry_after=1)
+    
+    hedger: Optional[Hedger] = request.app.state.hedgers.get(route) if hedge else None
+    start = time.perf_counter()
+    failed = None
+    try:
+        if hedger is not None:
+            response = await hedger.run(attempt, lambda r: r.status_code < 500)
+        else:
+            response = await attempt()
+        failed = response.status_code >= 500
+        if failed:
+            logger.error(f"{SERVICE_NAMES[backend]} returned {response.status_code}")
+        return response
+    except httpx.TransportError as e:
+        # Timeouts and connection / protocol errors
+        failed = True
+        logger.error(f"{SERVICE_NAMES[backend]} error: {e}")
+        raise BackendUnavailable(503, f"{SERVICE_NAMES[backend]} unavailable") from e
+    finally:
+        if failed is None:
+            # Cancelled (client went away): no outcome to learn from
+            limiter.release()
+            breaker.release_probe()
+        else:
+            limiter.release(time.perf_counter() - start, failed)
+            breaker.record(failed)
+
+async def fetch_buffered(
+    request: Request,
+    backend: str,
+    path: str,
+    route: str,
+    body: bytes
+) -> CachedResponse:
+    """Fully buffered backend call; hedged when enabled for the route"""
+    client = get_client(request, backend)
+    
+    async def attempt() -> CachedResponse:
+        upstream = await client.send(build_upstream_request(request, backend, path, route, body), stream=True)
+        try:
+            content = b"".join([chunk async for chunk in upstream.aiter_raw()])
+        finally:
+            await upstream.aclose()
+        return CachedResponse(upstream.status_code, forward_headers(upstream.headers, skip=SERVER_HEADERS), content)
+    
+    return await call_upstream(request, backend, route, attempt, hedge=True)
+
+async def proxy(
+    request: Request,
+    backend: str,
+    path: str,
+    route: str,
+    body: Optional[bytes] = None
+) -> StreamingResponse:
+    """
+    Streaming pass-through to a backend.
+    The request body and the response byte stream are forwarded unchanged,
+    chunk by chunk, so memory per request stays bounded and the client
+    starts receiving as soon as the backend does.
+    `body` is sent instead of the request stream when it was already read.
+    """
+    client = get_client(request, backend)
+    upstream_request = build_upstream_request(request, backend, path, route, body)
+    upstream = await call_upstream(request, backend, route, lambda: client.send(upstream_request, stream=True))
+    
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=forward_headers(upstream.headers, skip=SERVER_HEADERS),
+        background=BackgroundTask(upstream.aclose)
+    )
+
+async def cached_proxy(
+    request: Request,
+    backend: str,
+    path: str,
+    route: str,
+    body: Optional[bytes] = None
+) -> Response:
+    """
+    Serve from the response cache, or make one backend call shared by all
+    identical in-flight requests. Responses carry an X-Cache header.
+    """
+    cache: ResponseCache = request.app.state.response_cache
+    if body is None:
+        body = await request.body()
+    key = canonical_key(request.method, request.url.path, body, str(request.query_params))
+    # Cache hits are served even while the backend's circuit is open
+    cached, status = await cache.fetch(key, CACHE_TTLS[route], lambda: fetch_buffered(request, backend, path, route, body))
+    
+    return Response(
+        content=cached.body,
+        status_code=cached.status_code,
+        headers={**cached.headers, "X-Cache": status}
+    )
+
+async def forward(
+    request: Request,
+    backend: str,
+    path: str,
+    route: str,
+    body: Optional[bytes] = None,
+    cacheable: bool = True
+) -> Response:
+    """Route through the response cache when enabled for this request, else stream"""
+    if cacheable and request.app.state.response_cache is not None and CACHE_TTLS[route] > 0:
+        return await cached_proxy(request, backend, path, route, body)
+    if route in request.app.state.hedgers:
+        # A hedge replays the body, so hedged routes are buffered instead of streamed
+        if body is None:
+            body = await request.body()
+        response = await fetch_buffered(request, backend, path, route, body)
+        return Response(content=response.body, status_code=response.status_code, headers=response.headers)
+    return await proxy(request, backend, path, route, body)
+
+def has_seed(body: bytes) -> bool:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and payload.get("seed") is not None
 
 @app.get("/health")
 async def health_check():
@@ -45,23 +336,34 @@ async def generate_images(request: Request):
     Generate fashion images from text prompt
     Forwards to Image Generation Service
     """
-    try:
-        body = await request.json()
-        logger.info(f"Generating images with prompt: {body.get('prompt', '')[:50]}...")
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{IMAGE_GENERATION_SERVICE}/generate",
-                json=body
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
-        logger.error(f"Image generation service error: {e}")
-        raise HTTPException(status_code=503, detail="Image generation service unavailable")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    body = await request.body()
+    logger.info("Generating images")
+    # Only seeded generations are deterministic, and so safe to cache
+    return await forward(request, "image-generation", "/generate", "generate", body=body, cacheable=has_seed(body))
+
+@app.post("/api/v1/generate/jobs")
+async def submit_generation_job(request: Request):
+    """
+    Start an asynchronous generation job; returns a job id at once
+    Forwards to Image Generation Service
+    """
+    logger.info("Submitting generation job")
+    return await forward(request, "image-generation", "/jobs", "jobs", cacheable=False)
+
+@app.get("/api/v1/generate/jobs/{job_id}")
+async def get_generation_job(job_id: str, request: Request):
+    """Generation job status and finished images"""
+    return await forward(request, "image-generation", f"/jobs/{job_id}", "jobs", body=b"", cacheable=False)
+
+@app.get("/api/v1/generate/jobs/{job_id}/events")
+async def stream_generation_job(job_id: str, request: Request):
+    """Server-sent events with each image as soon as it is ready"""
+    return await forward(request, "image-generation", f"/jobs/{job_id}/events", "jobs", body=b"", cacheable=False)
+
+@app.delete("/api/v1/generate/jobs/{job_id}")
+async def cancel_generation_job(job_id: str, request: Request):
+    """Cancel a generation job"""
+    return await forward(request, "image-generation", f"/jobs/{job_id}", "jobs", body=b"", cacheable=False)
 
 @app.post("/api/v1/search")
 async def search_products(request: Request):
@@ -69,23 +371,17 @@ async def search_products(request: Request):
     Search for similar products using image
     Forwards to Search Engine Service
     """
-    try:
-        body = await request.json()
-        logger.info("Searching for similar products")
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{SEARCH_ENGINE_SERVICE}/search",
-                json=body
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
-        logger.error(f"Search engine service error: {e}")
-        raise HTTPException(status_code=503, detail="Search engine service unavailable")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    logger.info("Searching for similar products")
+    return await forward(request, "search-engine", "/search", "search")
+
+@app.post("/api/v1/search/batch")
+async def search_products_batch(request: Request):
+    """
+    Search for similar products for several images in one call
+    Forwards to Search Engine Service
+    """
+    logger.info("Batch searching for similar products")
+    return await forward(request, "search-engine", "/search/batch", "search")
 
 @app.post("/api/v1/ateliers")
 async def find_ateliers(request: Request):
@@ -93,23 +389,140 @@ async def find_ateliers(request: Request):
     Find matching ateliers for custom creation
     Forwards to Atelier Matching Service
     """
+    logger.info("Finding matching ateliers")
+    return await forward(request, "atelier-matching", "/match", "match")
+
+async def call_backend(request: Request, backend: str, path: str, route: str, payload: dict) -> dict:
+    """
+    JSON call to a backend for composite endpoints.
+    4xx responses raise BackendClientError with the backend's status and detail;
+    a success body that is not a JSON object raises BackendUnavailable (502).
+    """
+    client = get_client(request, backend)
+    response = await call_upstream(
+        request, backend, route,
+        lambda: client.post(path, json=payload, timeout=ROUTE_TIMEOUTS[route]),
+        hedge=True
+    )
+    if 400 <= response.status_code < 500:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise BackendClientError(response.status_code, detail)
+    response.raise_for_status()
     try:
-        body = await request.json()
-        logger.info("Finding matching ateliers")
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{ATELIER_MATCHING_SERVICE}/match",
-                json=body
-            )
-            response.raise_for_status()
-            return response.json()
+        data = response.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        logger.error(f"{SERVICE_NAMES[backend]} returned a non-JSON-object body for {path}")
+        raise BackendUnavailable(502, f"{SERVICE_NAMES[backend]} returned an invalid response")
+    return data
+
+def format_event(event: str, data: dict, sse: bool) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False)
+    if sse:
+        return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+    return (json.dumps({"event": event, **data}, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def design_to_shop_events(request: Request, body: dict, sse: bool) -> AsyncIterator[bytes]:
+    """
+    Generate images, then search products and match ateliers for every image
+    concurrently, yielding each result as soon as it completes.
+    """
+    start = time.perf_counter()
+    search_options = body.pop("search", None) or {}
+    atelier_options = body.pop("ateliers", None) or {}
+    
+    try:
+        generation = await call_backend(request, "image-generation", "/generate", "generate", body)
+    except (BackendClientError, BackendUnavailable) as e:
+        yield format_event("error", {"stage": "generate", "status": e.status_code, "detail": e.detail}, sse)
+        yield format_event("done", {"elapsed": time.perf_counter() - start}, sse)
+        return
     except httpx.HTTPError as e:
-        logger.error(f"Atelier matching service error: {e}")
-        raise HTTPException(status_code=503, detail="Atelier matching service unavailable")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Image generation service error: {e}")
+        yield format_event(
+            "error", {"stage": "generate", "status": 503, "detail": "Image generation service unavailable"}, sse
+        )
+        yield format_event("done", {"elapsed": time.perf_counter() - start}, sse)
+        return
+    yield format_event("generation", generation, sse)
+    
+    async def run(stage: str, index: int, image_url: str):
+        if stage == "products":
+            backend, path, route, options = "search-engine", "/search", "search", search_options
+        else:
+            backend, path, route, options = "atelier-matching", "/match", "match", atelier_options
+        try:
+            result = await call_backend(request, backend, path, route, {**options, "imageUrl": image_url})
+        except (BackendClientError, BackendUnavailable) as e:
+            return stage, index, image_url, None, {"status": e.status_code, "detail": e.detail}
+        except httpx.HTTPError as e:
+            logger.error(f"{SERVICE_NAMES[backend]} error: {e}")
+            return stage, index, image_url, None, {"status": 503, "detail": f"{SERVICE_NAMES[backend]} unavailable"}
+        return stage, index, image_url, result, None
+    
+    tasks = [
+        asyncio.ensure_future(run(stage, index, image_url))
+        for index, image_url in enumerate(generation.get("images", []))
+        for stage in ("products", "ateliers")
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            stage, index, image_url, result, error = await next_done
+            if error is not None:
+                yield format_event("error", {"stage": stage, "image_index": index, "imageUrl": image_url, **error}, sse)
+                continue
+            yield format_event(stage, {"image_index": index, "imageUrl": image_url, **result}, sse)
+    finally:
+        # Client went away or stream finished: drop any work still running
+        for task in tasks:
+            task.cancel()
+    
+    yield format_event("done", {"elapsed": time.perf_counter() - start}, sse)
+
+@app.post("/api/v1/design-to-shop")
+async def design_to_shop(request: Request):
+    """
+    Generate images and find products and ateliers for each of them in one call.
+    Body: a generation request plus optional "search" and "ateliers" option objects.
+    Streams NDJSON events (or SSE with Accept: text/event-stream):
+    generation, then products / ateliers per image as they complete, then done.
+    Error events carry a status: backend 4xx responses keep theirs, failures are 503 (or 429),
+    malformed backend responses 502.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+    
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    logger.info("Running design-to-shop fan-out")
+    return StreamingResponse(
+        design_to_shop_events(request, body, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/cache/stats")
+async def cache_stats(request: Request):
+    """Response cache counters"""
+    cache = request.app.state.response_cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+@app.get("/resilience/stats")
+async def resilience_stats(request: Request):
+    """Circuit breaker states, concurrency limits and hedging counters"""
+    state = request.app.state
+    return {
+        "breakers": {name: breaker.stats() for name, breaker in state.breakers.items()},
+        "limiters": {route: limiter.stats() for route, limiter in state.limiters.items()},
+        "hedging": {route: hedger.stats() for route, hedger in state.hedgers.items()},
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,201 @@
+"""
+Gateway Resilience
+Per-backend circuit breakers, adaptive (AIMD) concurrency limits per route
+and hedged requests for idempotent routes.
+"""
+
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class BackendUnavailable(Exception):
+    """Request rejected or failed before a usable backend response"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class BackendClientError(Exception):
+    """Backend rejected the request (4xx): the caller's fault, not a backend failure"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after `recovery_timeout` seconds;
+    half-open lets `half_open_max_calls` probes through: a success closes
+    the circuit, a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.half_open_calls = 0
+            logger.info(f"Circuit {self.name} half-open")
+        if self.state == self.HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def record(self, failed: bool) -> None:
+        if not failed:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit {self.name} open after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+    def release_probe(self) -> None:
+        """A half-open probe ended without an outcome (e.g. cancelled)"""
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def retry_after(self) -> float:
+        return max(0.0, self.recovery_timeout - (self.clock() - self.opened_at))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+        }
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: requests over the limit are rejected immediately
+    (the caller answers 429) rather than queued. Each fast, successful call
+    grows the limit by 1/limit (about +1 per window); a failure or a call
+    slower than `latency_target` shrinks it by `backoff`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        latency_target: float = 1.0,
+        backoff: float = 0.9
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.inflight = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self, latency: Optional[float] = None, failed: bool = False) -> None:
+        """Return a slot; latency None means the call ended without an outcome"""
+        self.inflight -= 1
+        if latency is None:
+            return
+        if failed or latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+            "latency_target": self.latency_target,
+        }
+
+class Hedger:
+    """
+    Hedged requests: if the first attempt has not finished after `delay`
+    seconds, start a second one and use whichever succeeds first.
+    Only for idempotent calls.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def run(self, attempt: Callable[[], Awaitable[T]], is_success: Callable[[T], bool]) -> T:
+        primary = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait({primary}, timeout=self.delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(attempt())
+        pending = {primary, hedge}
+        result, error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    result = task.result()
+                    if is_success(result):
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return result
+        finally:
+            for task in pending:
+                task.cancel()
+        if result is not None:
+            return result
+        raise error
+
+    def stats(self) -> dict:
+        return {"delay": self.delay, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
@@ -0,0 +1,146 @@
+"""
+Gateway Response Cache
+LRU cache of backend responses bounded by total bytes, keyed on the
+request method, path and canonicalized body, with per-entry TTL and
+singleflight coalescing: N identical in-flight requests share a single
+backend call.
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class CachedResponse:
+    """Fully buffered backend response"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+def _drop_nulls(value):
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(v) for v in value]
+    return value
+
+def canonical_key(method: str, path: str, body: bytes, query: str = "") -> str:
+    """
+    Cache key for a request: method and path (routes sharing a backend and
+    TTL must not share entries), plus the body. JSON bodies are parsed and
+    re-serialized with sorted keys and without null fields, so formatting and
+    key order do not matter. Other bodies are hashed as-is.
+    """
+    try:
+        canonical = json.dumps(_drop_nulls(json.loads(body)), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        payload = canonical.encode("utf-8")
+    except ValueError:
+        payload = body
+    digest = hashlib.sha256(payload).hexdigest()
+    return f"{method} {path}?{query}:{digest}"
+
+class ResponseCache:
+    """Byte-bounded LRU with TTL and singleflight request coalescing"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str) -> None:
+        response, _ = self._entries.pop(key)
+        self.current_bytes -= response.size
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if time.monotonic() > expires_at:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: str, response: CachedResponse, ttl: float) -> None:
+        size = response.size
+        if ttl <= 0 or size > self.max_entry_bytes or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (response, time.monotonic() + ttl)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def fetch(
+        self,
+        key: str,
+        ttl: float,
+        loader: Callable[[], Awaitable[CachedResponse]]
+    ) -> Tuple[CachedResponse, str]:
+        """
+        Return (response, cache status) where status is HIT, MISS or COALESCED.
+        The backend call runs as its own task, so a disconnecting client does
+        not cancel it for the other requests waiting on it.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, "HIT"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), "COALESCED"
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._load(key, ttl, loader))
+        self._inflight[key] = task
+        return await asyncio.shield(task), "MISS"
+
+    async def _load(self, key: str, ttl: float, loader: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        try:
+            response = await loader()
+            # Only successful responses are cached; errors are shared by coalesced waiters only
+            if response.status_code == 200:
+                self.put(key, response, ttl)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "inflight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,68 @@
+from resilience import CircuitBreaker
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def breaker(clock: Clock, **params) -> CircuitBreaker:
+    return CircuitBreaker("backend", failure_threshold=3, recovery_timeout=10.0, clock=clock, **params)
+
+def fail(b: CircuitBreaker, times: int) -> None:
+    for _ in range(times):
+        assert b.allow()
+        b.record(failed=True)
+
+def test_opens_after_consecutive_failures():
+    b = breaker(Clock())
+    fail(b, 2)
+    assert b.state == CircuitBreaker.CLOSED
+    fail(b, 1)
+    assert b.state == CircuitBreaker.OPEN
+    assert not b.allow() and b.rejected == 1
+
+def test_success_resets_the_failure_count():
+    b = breaker(Clock())
+    fail(b, 2)
+    b.record(failed=False)
+    fail(b, 2)
+    assert b.state == CircuitBreaker.CLOSED
+
+def test_half_open_after_recovery_timeout_and_success_closes():
+    clock = Clock()
+    b = breaker(clock)
+    fail(b, 3)
+    clock.now = 5.0
+    assert not b.allow()
+    assert b.retry_after() == 5.0
+    clock.now = 10.0
+    assert b.allow()
+    assert b.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not b.allow()
+    b.record(failed=False)
+    assert b.state == CircuitBreaker.CLOSED and b.consecutive_failures == 0
+    assert b.allow()
+
+def test_half_open_failure_reopens():
+    clock = Clock()
+    b = breaker(clock)
+    fail(b, 3)
+    clock.now = 10.0
+    assert b.allow()
+    b.record(failed=True)
+    assert b.state == CircuitBreaker.OPEN
+    assert b.opened_at == 10.0
+    assert not b.allow()
+
+def test_released_probe_lets_another_through():
+    clock = Clock()
+    b = breaker(clock)
+    fail(b, 3)
+    clock.now = 10.0
+    assert b.allow()
+    b.release_probe()
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert b.allow()
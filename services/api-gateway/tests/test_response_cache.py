@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from response_cache import CachedResponse, ResponseCache, canonical_key
+
+def response(body: bytes = b'{"ok": true}', status_code: int = 200) -> CachedResponse:
+    return CachedResponse(status_code, {"content-type": "application/json"}, body)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("response_cache.time.monotonic", clock)
+    return clock
+
+def test_entry_expires_after_ttl(clock):
+    cache = ResponseCache()
+    cache.put("k", response(), ttl=10)
+    clock.now += 9
+    assert cache.get("k") is not None
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.expirations == 1 and cache.current_bytes == 0
+
+def test_zero_ttl_and_oversized_entries_are_not_stored():
+    cache = ResponseCache(max_bytes=1000, max_entry_bytes=100)
+    cache.put("zero", response(), ttl=0)
+    cache.put("big", response(b"x" * 200), ttl=10)
+    assert cache.get("zero") is None and cache.get("big") is None
+
+def test_lru_eviction_keeps_byte_budget():
+    entry = response(b"x" * 100)
+    cache = ResponseCache(max_bytes=3 * entry.size)
+    for key in "abc":
+        cache.put(key, entry, ttl=60)
+    cache.get("a")
+    cache.put("d", entry, ttl=60)
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.current_bytes == 3 * entry.size and cache.evictions == 1
+
+def test_replacing_an_entry_keeps_the_byte_count():
+    cache = ResponseCache()
+    cache.put("k", response(b"a" * 50), ttl=60)
+    cache.put("k", response(b"b" * 20), ttl=60)
+    assert cache.current_bytes == response(b"b" * 20).size
+
+def test_concurrent_misses_share_one_backend_call():
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return response()
+
+    async def run():
+        cache = ResponseCache()
+        results = await asyncio.gather(*(cache.fetch("k", 60, loader) for _ in range(5)))
+        again = await cache.fetch("k", 60, loader)
+        return cache, results, again
+
+    cache, results, again = asyncio.run(run())
+    assert calls == 1
+    assert sorted(status for _, status in results) == ["COALESCED"] * 4 + ["MISS"]
+    assert again[1] == "HIT"
+    assert cache.stats()["coalesced"] == 4
+
+def test_errors_are_shared_but_not_cached():
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return response(b"{}", status_code=502)
+
+    async def run():
+        cache = ResponseCache()
+        results = await asyncio.gather(*(cache.fetch("k", 60, loader) for _ in range(3)))
+        await cache.fetch("k", 60, loader)
+        return results
+
+    results = asyncio.run(run())
+    assert calls == 2
+    assert all(r.status_code == 502 for r, _ in results)
+
+def test_canonical_key_ignores_formatting_and_nulls():
+    a = canonical_key("POST", "/api/v1/search", b'{"b": 1, "a": [1, 2], "c": null}')
+    b = canonical_key("POST", "/api/v1/search", b'{"a":[1,2],"b":1}')
+    assert a == b
+    assert a != canonical_key("POST", "/api/v1/match", b'{"a":[1,2],"b":1}')
@@ -0,0 +1,14 @@
+"""
+Import path setup, imported first by every module that uses shared/.
+In the Docker image shared/ is copied next to the service modules; in a
+source checkout it lives at the repository root, which is added here.
+"""
+
+from pathlib import Path
+import sys
+
+SERVICE_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SERVICE_DIR.parent.parent
+
+if not (SERVICE_DIR / "shared").is_dir() and str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
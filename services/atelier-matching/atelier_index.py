@@ -0,0 +1,363 @@
+"""
+Atelier Index
+Columnar atelier directory with inverted indexes built once at load:
+category -> rows (candidate generation), a per-row complexity bitmask,
+location postings by region id and by normalized token, a geo grid over
+atelier coordinates (radius / nearest-k pruning, distance decay), and price
+ranges sorted by minimum price per currency (budget pruning). Matching
+scores only the eligible ateliers, in one vectorized pass, optionally
+blended with design-to-portfolio similarity.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+import re
+import numpy as np
+
+import _paths  # puts shared/ on the import path in a source checkout
+from shared.schemas.atelier import DEFAULT_CURRENCY, parse_price_range
+
+from geo import GeoIndex, Gazetteer, Point
+from portfolio import PortfolioMatrix
+
+logger = logging.getLogger(__name__)
+
+# Match score weights
+CATEGORY_WEIGHT = 0.4    # required
+COMPLEXITY_WEIGHT = 0.3
+LOCATION_WEIGHT = 0.2
+BUDGET_WEIGHT = 0.1
+RATING_WEIGHT = 0.1      # ratings 3-5 map to 0-0.1
+
+MIN_MATCH_SCORE = 0.3
+
+# Location score decays as exp(-distance / LOCATION_DECAY_KM): ~0.8 at 10 km, ~0.3 at 60 km
+LOCATION_DECAY_KM = 50.0
+
+# Share of the final score taken by design-to-portfolio similarity when a
+# design embedding is given (the rule-based score keeps the rest)
+PORTFOLIO_WEIGHT = 0.3
+
+# Ateliers whose minimum price exceeds the budget by more than this share are pruned;
+# within it the budget score decays linearly to 0
+BUDGET_TOLERANCE = 0.2
+
+COMPLEXITY_LEVELS = ["low", "medium", "high"]
+COMPLEXITY_BITS = {level: 1 << i for i, level in enumerate(COMPLEXITY_LEVELS)}
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def normalize_location(text: Optional[str]) -> str:
+    """Lowercase, ё -> е, punctuation and separators collapsed to single spaces"""
+    if not text:
+        return ""
+    return _NON_WORD.sub(" ", text.lower().replace("ё", "е")).strip()
+
+def canonical_location(text: Optional[str], gazetteer: Optional[Gazetteer] = None) -> str:
+    """Normalized location; city aliases come from the gazetteer"""
+    if gazetteer is None:
+        return normalize_location(text)
+    return gazetteer.canonical(text)
+
+class PriceIndex:
+    """
+    Parsed price ranges as columns (NaN min = unknown, inf max = open-ended),
+    with rows sorted by minimum price per currency so that "what fits this
+    budget" is one binary search.
+    """
+
+    def __init__(self, mins: np.ndarray, maxs: np.ndarray, currencies: np.ndarray):
+        self.mins = np.asarray(mins, dtype=np.float64)
+        self.maxs = np.asarray(maxs, dtype=np.float64)
+        self.currencies = np.asarray(currencies, dtype=object)
+
+        known = ~np.isnan(self.mins)
+        self.unknown_rows = np.flatnonzero(~known)
+        self.by_currency: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for currency in set(self.currencies.tolist()):
+            rows = np.flatnonzero(known & (self.currencies == currency))
+            order = np.argsort(self.mins[rows], kind="stable")
+            self.by_currency[currency] = (self.mins[rows][order], rows[order])
+
+    def affordable_rows(self, budget: float, currency: str = DEFAULT_CURRENCY) -> np.ndarray:
+        """Sorted rows whose minimum price is within the budget (plus tolerance), and rows with unknown prices"""
+        sorted_mins, rows = self.by_currency.get(currency, (np.empty(0), np.empty(0, dtype=np.int64)))
+        end = np.searchsorted(sorted_mins, budget * (1 + BUDGET_TOLERANCE), side="right")
+        return np.sort(np.concatenate([rows[:end], self.unknown_rows]))
+
+    def budget_fit(self, rows: np.ndarray, budget: float) -> np.ndarray:
+        """
+        Continuous fit in [0, 1]: 1 inside the range, decaying to 0 as the
+        minimum price exceeds the budget by BUDGET_TOLERANCE, and max/budget
+        for ateliers that top out below it. Unknown prices get 0.5.
+        """
+        low, high = self.mins[rows], self.maxs[rows]
+        fit = np.ones(len(rows), dtype=np.float64)
+        above = budget < low
+        fit[above] = np.clip(1.0 - (low[above] - budget) / (budget * BUDGET_TOLERANCE), 0.0, 1.0)
+        below = budget > high
+        fit[below] = high[below] / budget
+        fit[np.isnan(low)] = 0.5
+        return fit
+
+class AtelierColumns(NamedTuple):
+    """Everything AtelierIndex is built from, as arrays (row i = atelier i)"""
+    ids: np.ndarray
+    ratings: np.ndarray
+    complexity_mask: np.ndarray  # uint8 COMPLEXITY_BITS
+    region_codes: np.ndarray  # int32 codes into regions
+    regions: List[str]  # canonical locations
+    category_rows: Dict[str, np.ndarray]  # category -> sorted rows
+    location_tokens: Dict[str, np.ndarray]  # region token -> sorted rows
+    latitudes: np.ndarray  # NaN when unknown
+    longitudes: np.ndarray
+    price_mins: np.ndarray  # NaN when unknown
+    price_maxs: np.ndarray  # inf when open-ended
+    currencies: np.ndarray  # object array of currency codes
+
+class ColumnBuilder:
+    """
+    Accumulates ateliers one at a time into AtelierColumns, so a streamed
+    directory is indexed in a single pass without keeping the records
+    """
+
+    def __init__(self, gazetteer: Optional[Gazetteer] = None):
+        # City aliases, and coordinates for ateliers without explicit latitude/longitude
+        self.gazetteer = gazetteer
+        self.ids: List[str] = []
+        self.ratings: List[float] = []
+        self.complexity: List[int] = []
+        self.region_codes: List[int] = []
+        self.region_ids: Dict[str, int] = {}
+        self.category_rows: Dict[str, List[int]] = {}
+        self.location_tokens: Dict[str, List[int]] = {}
+        self.latitudes: List[float] = []
+        self.longitudes: List[float] = []
+        self.price_mins: List[float] = []
+        self.price_maxs: List[float] = []
+        self.currencies: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def resolve(self, location: Optional[str]) -> Optional[Point]:
+        return self.gazetteer.resolve(location) if self.gazetteer is not None else None
+
+    def add(self, a: dict) -> None:
+        row = len(self.ids)
+        self.ids.append(str(a["id"]))
+        self.ratings.append(a.get("rating", 0.0))
+
+        for category in {c.strip().lower() for c in a.get("categories", [])}:
+            self.category_rows.setdefault(category, []).append(row)
+        self.complexity.append(
+            sum(COMPLEXITY_BITS.get(level.strip().lower(), 0) for level in set(a.get("complexity_range", [])))
+        )
+
+        # Region id per row (its canonical city), with token postings for partial matches
+        region = canonical_location(a.get("location"), self.gazetteer)
+        self.region_codes.append(self.region_ids.setdefault(region, len(self.region_ids)))
+        for token in set(region.split()):
+            self.location_tokens.setdefault(token, []).append(row)
+
+        # Explicit coordinates, else the gazetteer centre of the atelier's city
+        point = (a.get("latitude"), a.get("longitude"))
+        if point[0] is None or point[1] is None:
+            point = self.resolve(a.get("location")) or (np.nan, np.nan)
+        self.latitudes.append(point[0])
+        self.longitudes.append(point[1])
+
+        # Validated records carry the parsed range already; raw ones are parsed here, once
+        if "price_min" in a or "price_max" in a:
+            low, high, currency = a.get("price_min"), a.get("price_max"), a.get("currency", DEFAULT_CURRENCY)
+        else:
+            low, high, currency = parse_price_range(a.get("priceRange"))
+        self.price_mins.append(np.nan if low is None else low)
+        self.price_maxs.append(np.inf if high is None else high)
+        self.currencies.append(currency)
+
+    def build(self) -> AtelierColumns:
+        return AtelierColumns(
+            ids=np.array(self.ids, dtype=str),
+            ratings=np.array(self.ratings, dtype=np.float64),
+            complexity_mask=np.array(self.complexity, dtype=np.uint8),
+            region_codes=np.array(self.region_codes, dtype=np.int32),
+            regions=list(self.region_ids),
+            category_rows={k: np.array(v, dtype=np.int64) for k, v in self.category_rows.items()},
+            location_tokens={k: np.array(v, dtype=np.int64) for k, v in self.location_tokens.items()},
+            latitudes=np.array(self.latitudes, dtype=np.float64),
+            longitudes=np.array(self.longitudes, dtype=np.float64),
+            price_mins=np.array(self.price_mins, dtype=np.float64),
+            price_maxs=np.array(self.price_maxs, dtype=np.float64),
+            currencies=np.array(self.currencies, dtype=object)
+        )
+
+class MatchResult(NamedTuple):
+    rows: np.ndarray
+    scores: np.ndarray
+    distances: np.ndarray  # km from the query location, NaN when unknown
+    similarities: np.ndarray  # design-to-portfolio similarity, NaN when not scored
+    total: int
+
+class AtelierIndex:
+    """Ateliers as column arrays plus inverted indexes for matching"""
+
+    def __init__(
+        self,
+        records: Sequence[dict],
+        gazetteer: Optional[Gazetteer] = None,
+        portfolio: Optional[PortfolioMatrix] = None,
+        columns: Optional[AtelierColumns] = None
+    ):
+        """`records` are the response rows; `columns` skips rebuilding them (bulk load, snapshot)"""
+        self.records = records
+        self.gazetteer = gazetteer
+        if columns is None:
+            builder = ColumnBuilder(gazetteer)
+            for a in records:
+                builder.add(a)
+            columns = builder.build()
+
+        self.ids = columns.ids
+        self.ratings = columns.ratings
+        self.category_rows = columns.category_rows
+        self.complexity_mask = columns.complexity_mask
+        self.region_ids: Dict[str, int] = {region: i for i, region in enumerate(columns.regions)}
+        self.region_codes = columns.region_codes
+        self.location_tokens = columns.location_tokens
+        self.geo = GeoIndex(columns.latitudes, columns.longitudes)
+        self.prices = PriceIndex(columns.price_mins, columns.price_maxs, columns.currencies)
+        # Centroid row i belongs to record i
+        self.portfolio = portfolio.aligned(self.ids.tolist()) if portfolio is not None else None
+        logger.info(
+            f"Indexed {len(self.ids)} ateliers: {len(self.category_rows)} categories, {len(self.region_ids)} regions"
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def candidates(self, category: str) -> np.ndarray:
+        """Rows that make the category (required for any match)"""
+        return self.category_rows.get(category.strip().lower(), np.empty(0, dtype=np.int64))
+
+    def resolve(self, location: Optional[str]) -> Optional[Point]:
+        """Coordinates of a free-form location via the gazetteer, if known"""
+        if self.gazetteer is None:
+            return None
+        return self.gazetteer.resolve(location)
+
+    def location_match(self, rows: np.ndarray, location: Optional[str]) -> np.ndarray:
+        """
+        Bool per row: same region as `location`, or the atelier location
+        contains every token of it (e.g. a district or street)
+        """
+        query = canonical_location(location, self.gazetteer)
+        if not query:
+            return np.zeros(len(rows), dtype=bool)
+        region = self.region_ids.get(query)
+        if region is not None:
+            return self.region_codes[rows] == region
+
+        matching: Optional[np.ndarray] = None
+        for token in query.split():
+            token_rows = self.location_tokens.get(token)
+            if token_rows is None:
+                return np.zeros(len(rows), dtype=bool)
+            matching = token_rows if matching is None else np.intersect1d(matching, token_rows, assume_unique=True)
+        return np.isin(rows, matching, assume_unique=True)
+
+    def score(
+        self,
+        features: dict,
+        location: Optional[str] = None,
+        budget: Optional[float] = None,
+        currency: str = DEFAULT_CURRENCY,
+        point: Optional[Point] = None,
+        radius_km: Optional[float] = None,
+        nearest_k: Optional[int] = None,
+        design_embedding: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (candidate rows, match scores, distances, portfolio similarities) for
+        a design's features. `point` overrides the gazetteer lookup of
+        `location`; radius and nearest-k restrict candidates through the geo
+        index. With a design embedding, portfolio similarity is blended in.
+        """
+        if point is None:
+            point = self.resolve(location)
+        if point is None and (radius_km or nearest_k):
+            raise ValueError(f"Unknown location for a geo query: {location!r}")
+
+        rows = self.candidates(features["category"])
+        if budget and rows.size:
+            # Drop ateliers the budget cannot cover before scoring
+            rows = np.intersect1d(rows, self.prices.affordable_rows(budget, currency), assume_unique=True)
+        if radius_km and rows.size:
+            nearby, _ = self.geo.within(point, radius_km)
+            rows = np.intersect1d(rows, nearby, assume_unique=True)
+        if nearest_k and rows.size:
+            rows = np.sort(self.geo.nearest(point, nearest_k, allowed=rows)[0])
+        if rows.size == 0:
+            empty = np.empty(0, dtype=np.float64)
+            return rows, empty, empty, empty
+
+        complexity_bit = COMPLEXITY_BITS.get(features.get("complexity", "medium"), 0)
+        complexity_ok = (self.complexity_mask[rows] & complexity_bit) != 0
+
+        scores = np.full(len(rows), CATEGORY_WEIGHT, dtype=np.float64)
+        scores += COMPLEXITY_WEIGHT * complexity_ok
+        distances = np.full(len(rows), np.nan, dtype=np.float64)
+        if point is not None:
+            distances = self.geo.distances(rows, point)
+            located = ~np.isnan(distances)
+            location_score = np.exp(-distances[located] / LOCATION_DECAY_KM)
+            scores[located] += LOCATION_WEIGHT * location_score
+            if location and not located.all():
+                # Ateliers without coordinates fall back to the region/token match
+                scores[~located] += LOCATION_WEIGHT * self.location_match(rows[~located], location)
+        elif location:
+            scores += LOCATION_WEIGHT * self.location_match(rows, location)
+        if budget:
+            scores += BUDGET_WEIGHT * self.prices.budget_fit(rows, budget)
+        scores += (self.ratings[rows] - 3.0) / 2.0 * RATING_WEIGHT
+        scores = np.minimum(1.0, scores)
+
+        similarities = np.full(len(rows), np.nan, dtype=np.float64)
+        if design_embedding is not None and self.portfolio is not None:
+            similarities = self.portfolio.similarity(rows, design_embedding)
+            scored = ~np.isnan(similarities)
+            if scored.any():
+                # matchScore = (1 - PORTFOLIO_WEIGHT) * rule score + PORTFOLIO_WEIGHT * similarity,
+                # both in [0, 1]; ateliers without a portfolio are blended with the candidates'
+                # mean similarity, so they score as an average portfolio would
+                blended = np.where(scored, similarities, similarities[scored].mean())
+                scores = (1 - PORTFOLIO_WEIGHT) * scores + PORTFOLIO_WEIGHT * blended
+        return rows, scores, distances, similarities
+
+    def match(
+        self,
+        features: dict,
+        location: Optional[str] = None,
+        budget: Optional[float] = None,
+        max_results: int = 10,
+        min_score: float = MIN_MATCH_SCORE,
+        currency: str = DEFAULT_CURRENCY,
+        point: Optional[Point] = None,
+        radius_km: Optional[float] = None,
+        nearest_k: Optional[int] = None,
+        design_embedding: Optional[np.ndarray] = None
+    ) -> MatchResult:
+        """Best ateliers first, with their scores, distances and similarities, and the total match count"""
+        columns = self.score(
+            features, location, budget, currency, point, radius_km, nearest_k, design_embedding
+        )
+        keep = columns[1] > min_score
+        rows, scores, distances, similarities = (column[keep] for column in columns)
+        total = len(rows)
+
+        k = min(max_results, total)
+        if k < total:
+            part = np.argpartition(-scores, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+            rows, scores, distances, similarities = rows[part], scores[part], distances[part], similarities[part]
+        order = np.argsort(-scores, kind="stable")
+        return MatchResult(rows[order], scores[order], distances[order], similarities[order], total)
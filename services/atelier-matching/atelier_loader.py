@@ -0,0 +1,471 @@
+"""
+Bulk Atelier Loader
+Streams an atelier directory dump (JSONL, CSV or Parquet), validates it
+against the shared Atelier schema in batches and feeds the index columns in
+the same pass. The result can be written as a snapshot directory that later
+starts memory-map instead of parsing and validating the dump again. Each load
+writes a new version directory inside it and then atomically replaces the
+CURRENT pointer file, so readers never see a partly written snapshot and there
+is always a complete one to open.
+
+Snapshot directory:
+    CURRENT                 name of the version directory to read
+    v<timestamp>-<pid>/     one published snapshot per load (current and previous kept)
+    v<timestamp>-<pid>.tmp/ a load still being written
+
+Version layout:
+    manifest.json           format version, row count, source file and gazetteer signatures
+    ids.npy                 (N,) atelier ids
+    ratings.npy             (N,) float64
+    complexity_mask.npy     (N,) uint8
+    region_codes.npy        (N,) int32 codes into columns.json["regions"]
+    latitudes.npy           (N,) float64, NaN when unknown
+    longitudes.npy          (N,) float64
+    price_mins.npy          (N,) float64, NaN when unknown
+    price_maxs.npy          (N,) float64, inf when open-ended
+    currency_codes.npy      (N,) int32 codes into columns.json["currencies"]
+    postings.npy            category and location-token postings, concatenated
+    columns.json            regions, currencies, posting offsets per value
+    records.jsonl           response fields, one JSON object per row
+    record_offsets.npy      (N + 1,) uint64 byte offsets into records.jsonl
+
+CSV dumps use one column per Atelier field; list fields are "|"-separated,
+contact details are flat phone/email/website/instagram columns and numbers
+are coerced by validation. Parquet dumps (which need pyarrow) use the
+Atelier field names with native list and struct columns.
+
+Build a snapshot:
+    python atelier_loader.py load ateliers.csv ./atelier-snapshot
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import fcntl
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+import numpy as np
+from pydantic import ValidationError
+
+import _paths  # puts shared/ on the import path in a source checkout
+from shared.schemas.atelier import Atelier
+
+from atelier_index import AtelierColumns, ColumnBuilder, normalize_location
+from geo import DEFAULT_GAZETTEER_PATH, Gazetteer
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+
+LIST_FIELDS = ["specialization", "portfolioImages", "complexity_range", "categories"]
+CONTACT_FIELDS = ["phone", "email", "website", "instagram"]
+
+# Fields kept per row for responses (matching itself only reads the columns)
+RECORD_FIELDS = {
+    "id", "name", "location", "specialization", "priceRange", "rating", "portfolioImages", "contact",
+    "latitude", "longitude", "price_min", "price_max", "currency", "complexity_range", "categories",
+}
+
+class LoadStats:
+    """Row counters and throughput of one load"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.rows_read = 0
+        self.rows_loaded = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def finish(self) -> "LoadStats":
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.seconds or (time.perf_counter() - self.started)
+        return self.rows_read / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "rows_read": self.rows_read,
+            "rows_loaded": self.rows_loaded,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_csv(path: Path) -> Iterator[dict]:
+    """CSV rows shaped like Atelier input: lists split on "|", contact nested, blanks dropped"""
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            record = {key: value for key, value in row.items() if key and value not in (None, "")}
+            for field in LIST_FIELDS:
+                if field in record:
+                    record[field] = [item.strip() for item in record[field].split("|") if item.strip()]
+            contact = {field: record.pop(field) for field in CONTACT_FIELDS if field in record}
+            if contact:
+                record["contact"] = contact
+            yield record
+
+def read_parquet(path: Path, batch_size: int = 10000) -> Iterator[dict]:
+    """Parquet rows read one record batch at a time; null columns are dropped like blank CSV cells"""
+    import pyarrow.parquet as pq  # optional: only Parquet dumps need it
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        for row in batch.to_pylist():
+            yield {key: value for key, value in row.items() if value is not None}
+
+def read_dump(path: str) -> Iterator[dict]:
+    """Raw atelier dicts from a .jsonl/.ndjson, .csv or .parquet file, streamed"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return read_jsonl(path)
+    if suffix == ".csv":
+        return read_csv(path)
+    if suffix == ".parquet":
+        return read_parquet(path)
+    raise ValueError(f"Unsupported atelier dump format: {path.name} (expected .jsonl, .ndjson, .csv or .parquet)")
+
+def validate_rows(batch: List[dict]) -> Tuple[List[dict], List[Tuple[str, str]]]:
+    """
+    Validate one batch as Atelier, row by row so a bad row costs only itself
+    (a whole-batch TypeAdapter call has to be repeated for the remaining rows
+    after any failure). Returns response-ready dicts (prices parsed,
+    timestamps dropped) and (id, error) for the rows that failed.
+    """
+    records, errors = [], []
+    for row in batch:
+        try:
+            records.append(Atelier.model_validate(row).model_dump(include=RECORD_FIELDS))
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            errors.append((str(row.get("id", "?")), f"{field}: {error['msg']}"))
+    return records, errors
+
+def validate_batches(
+    rows: Iterable[dict],
+    stats: LoadStats,
+    batch_size: int = 1000,
+    pool: Optional[ProcessPoolExecutor] = None,
+    workers: int = 1
+) -> Iterator[dict]:
+    """
+    Validate raw rows in batches, yielding valid records in input order.
+    With a pool, batches are validated in its `workers` processes (schema
+    and email checks are CPU-bound), at most two per worker in flight.
+    """
+    def batches() -> Iterator[List[dict]]:
+        batch: List[dict] = []
+        for row in rows:
+            stats.rows_read += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def collect(result: Tuple[List[dict], List[Tuple[str, str]]]) -> List[dict]:
+        records, errors = result
+        for atelier_id, error in errors:
+            if stats.invalid < 10:
+                logger.warning(f"Skipping invalid atelier {atelier_id}: {error}")
+            stats.invalid += 1
+        return records
+
+    if pool is None:
+        for batch in batches():
+            yield from collect(validate_rows(batch))
+        return
+
+    pending: Deque[Future] = deque()
+    for batch in batches():
+        pending.append(pool.submit(validate_rows, batch))
+        if len(pending) >= 2 * workers:
+            yield from collect(pending.popleft().result())
+    while pending:
+        yield from collect(pending.popleft().result())
+
+class RecordSidecar:
+    """
+    Read-only row access to records.jsonl through a memory map.
+    Rows are decoded on demand, so only returned matches pay JSON parsing.
+    """
+
+    def __init__(self, path: Path):
+        self._offsets = np.load(path / "record_offsets.npy", mmap_mode="r")
+        self._data = b""
+        records_path = path / "records.jsonl"
+        if records_path.stat().st_size:
+            with open(records_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> dict:
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._data[start:end])
+
+    def __iter__(self) -> Iterator[dict]:
+        for row in range(len(self)):
+            yield self[row]
+
+def source_signature(path: str) -> dict:
+    stat = Path(path).stat()
+    return {"path": str(Path(path).resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def bulk_load(
+    source: str,
+    gazetteer: Optional[Gazetteer] = None,
+    snapshot_path: Optional[str] = None,
+    batch_size: int = 1000,
+    workers: int = 1,
+    progress_every: int = 50000
+) -> Tuple[List[dict], AtelierColumns, LoadStats]:
+    """
+    Stream, validate and index a dump in one pass. With a snapshot path the
+    records go straight to records.jsonl in a new version directory that is
+    published once complete, and are served from it; otherwise they are
+    kept in memory. The validation pool only exists while the dump is read.
+    """
+    stats = LoadStats(source)
+    builder = ColumnBuilder(gazetteer)
+    seen = set()
+    records: List[dict] = []
+    offsets = [0]
+    records_file = None
+    staging = None
+    if snapshot_path:
+        staging = new_version_path(Path(snapshot_path))
+        staging.mkdir(parents=True)
+        records_file = open(staging / "records.jsonl", "wb")
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        for record in validate_batches(read_dump(source), stats, batch_size, pool, workers):
+            if record["id"] in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(record["id"])
+            builder.add(record)
+            if records_file is not None:
+                records_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                offsets.append(records_file.tell())
+            else:
+                records.append(record)
+            stats.rows_loaded += 1
+            if stats.rows_loaded % progress_every == 0:
+                logger.info(f"Loaded {stats.rows_loaded} ateliers ({stats.rows_per_second:,.0f} rows/s)")
+    except BaseException:
+        # No half-written version directory is left behind
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if records_file is not None:
+            records_file.close()
+
+    columns = builder.build()
+    stats.finish()
+    logger.info(
+        f"Loaded {stats.rows_loaded} ateliers from {source} in {stats.seconds:.2f}s "
+        f"({stats.rows_per_second:,.0f} rows/s, {stats.invalid} invalid, {stats.duplicates} duplicates)"
+    )
+    if snapshot_path:
+        try:
+            np.save(staging / "record_offsets.npy", np.array(offsets, dtype=np.uint64))
+            write_snapshot_columns(
+                columns, staging, source_signature(source), gazetteer.signature() if gazetteer is not None else None
+            )
+            version = publish_snapshot(staging, Path(snapshot_path))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return RecordSidecar(version), columns, stats
+    return records, columns, stats
+
+def new_version_path(path: Path) -> Path:
+    """Staging name of a new version; the suffix is dropped when it is published"""
+    return path / f"v{time.time_ns()}-{os.getpid()}.tmp"
+
+def current_version(path: Path) -> Optional[Path]:
+    """The version directory CURRENT points at, or None before the first publish"""
+    try:
+        name = (path / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return path / name if name else None
+
+def publish_snapshot(staging: Path, path: Path) -> Path:
+    """
+    Publish a fully written staging directory: rename it to its version name,
+    then atomically replace CURRENT, so a reader sees the old or the new
+    snapshot and never neither. Publishing is serialized across processes by
+    a lock file. The version CURRENT pointed at before is kept for readers
+    that resolved it just before; older published versions are removed
+    (processes still mapping their files keep reading them), while staging
+    directories of loads still running are left alone.
+    """
+    version = staging.with_suffix("")
+    with open(path / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        previous = current_version(path)
+        os.replace(staging, version)
+        pointer = path / f"CURRENT.tmp-{os.getpid()}"
+        pointer.write_text(version.name)
+        os.replace(pointer, path / "CURRENT")
+        keep = {version.name, previous.name if previous is not None else None}
+        for entry in path.iterdir():
+            if entry.is_dir() and entry.suffix != ".tmp" and entry.name not in keep:
+                shutil.rmtree(entry, ignore_errors=True)
+    return version
+
+def _flatten_postings(postings: Dict[str, np.ndarray], start: int) -> Tuple[List[np.ndarray], Dict[str, List[int]]]:
+    arrays, spans = [], {}
+    for value, rows in postings.items():
+        spans[value] = [start, start + len(rows)]
+        arrays.append(rows)
+        start += len(rows)
+    return arrays, spans
+
+def write_snapshot_columns(
+    columns: AtelierColumns,
+    path: Path,
+    source: Optional[dict] = None,
+    gazetteer: Optional[str] = None
+) -> None:
+    """Write the column arrays and, last, the manifest next to an existing records.jsonl"""
+    path = Path(path)
+    currencies = sorted(set(columns.currencies.tolist()))
+    currency_codes = {currency: i for i, currency in enumerate(currencies)}
+    category_arrays, category_spans = _flatten_postings(columns.category_rows, 0)
+    token_start = sum(len(rows) for rows in category_arrays)
+    token_arrays, token_spans = _flatten_postings(columns.location_tokens, token_start)
+    postings = category_arrays + token_arrays
+
+    np.save(path / "ids.npy", columns.ids)
+    np.save(path / "ratings.npy", columns.ratings)
+    np.save(path / "complexity_mask.npy", columns.complexity_mask)
+    np.save(path / "region_codes.npy", columns.region_codes)
+    np.save(path / "latitudes.npy", columns.latitudes)
+    np.save(path / "longitudes.npy", columns.longitudes)
+    np.save(path / "price_mins.npy", columns.price_mins)
+    np.save(path / "price_maxs.npy", columns.price_maxs)
+    np.save(path / "currency_codes.npy", np.array(
+        [currency_codes[c] for c in columns.currencies.tolist()], dtype=np.int32
+    ))
+    np.save(path / "postings.npy", np.concatenate(postings) if postings else np.empty(0, dtype=np.int64))
+    (path / "columns.json").write_text(json.dumps({
+        "regions": columns.regions,
+        "currencies": currencies,
+        "categories": category_spans,
+        "location_tokens": token_spans,
+    }, ensure_ascii=False))
+    (path / "manifest.json").write_text(json.dumps({
+        "version": FORMAT_VERSION,
+        "count": len(columns.ids),
+        "source": source,
+        "gazetteer": gazetteer,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }, indent=2))
+
+def snapshot_is_current(path: str, source: Optional[str] = None, gazetteer: Optional[Gazetteer] = None) -> bool:
+    """
+    A readable snapshot of this format, built from `source` as it is now and
+    with the same gazetteer (each checked when given)
+    """
+    version = current_version(Path(path))
+    if version is None or not (version / "manifest.json").exists():
+        return False
+    manifest = json.loads((version / "manifest.json").read_text())
+    if manifest.get("version") != FORMAT_VERSION:
+        return False
+    if source is not None and manifest.get("source") != source_signature(source):
+        return False
+    return gazetteer is None or manifest.get("gazetteer") == gazetteer.signature()
+
+def load_snapshot(path: str) -> Tuple[RecordSidecar, AtelierColumns]:
+    """Open the current snapshot version; arrays are memory-mapped, records decoded on demand"""
+    path = current_version(Path(path))
+    if path is None:
+        raise FileNotFoundError("Atelier snapshot has no CURRENT version")
+    manifest = json.loads((path / "manifest.json").read_text())
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported atelier snapshot version: {manifest.get('version')}")
+
+    meta = json.loads((path / "columns.json").read_text())
+    postings = np.load(path / "postings.npy", mmap_mode="r")
+    columns = AtelierColumns(
+        ids=np.load(path / "ids.npy"),
+        ratings=np.load(path / "ratings.npy", mmap_mode="r"),
+        complexity_mask=np.load(path / "complexity_mask.npy", mmap_mode="r"),
+        region_codes=np.load(path / "region_codes.npy", mmap_mode="r"),
+        regions=meta["regions"],
+        category_rows={value: postings[start:end] for value, (start, end) in meta["categories"].items()},
+        location_tokens={value: postings[start:end] for value, (start, end) in meta["location_tokens"].items()},
+        latitudes=np.load(path / "latitudes.npy", mmap_mode="r"),
+        longitudes=np.load(path / "longitudes.npy", mmap_mode="r"),
+        price_mins=np.load(path / "price_mins.npy", mmap_mode="r"),
+        price_maxs=np.load(path / "price_maxs.npy", mmap_mode="r"),
+        currencies=np.array(meta["currencies"], dtype=object)[np.load(path / "currency_codes.npy")]
+    )
+    logger.info(f"Mapped atelier snapshot {path}: {manifest['count']} ateliers")
+    return RecordSidecar(path), columns
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Bulk atelier loader")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load = subparsers.add_parser("load", help="Validate a dump and write a snapshot directory")
+    load.add_argument("input", help="Atelier dump (.jsonl, .ndjson, .csv or .parquet)")
+    load.add_argument("output", help="Output snapshot directory")
+    load.add_argument("--batch-size", type=int, default=1000)
+    load.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Validation processes")
+    load.add_argument(
+        "--gazetteer", default=str(DEFAULT_GAZETTEER_PATH), help="City gazetteer CSV for ateliers without coordinates"
+    )
+
+    info = subparsers.add_parser("info", help="Print a snapshot manifest")
+    info.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "load":
+        gazetteer = Gazetteer.from_csv(Path(args.gazetteer), normalize_location)
+        _, _, stats = bulk_load(
+            args.input, gazetteer, snapshot_path=args.output, batch_size=args.batch_size, workers=args.workers
+        )
+        print(json.dumps(stats.as_dict(), indent=2))
+    else:
+        version = current_version(Path(args.path))
+        if version is None:
+            parser.error(f"{args.path} has no CURRENT snapshot version")
+        print((version / "manifest.json").read_text())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Geo Index
+Offline city gazetteer and a grid-bucket spatial index over atelier
+coordinates. Radius and nearest-k queries only visit the grid cells
+around the query point; exact distances are haversine.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import csv
+import hashlib
+import json
+import logging
+import math
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+DEFAULT_GAZETTEER_PATH = Path(__file__).resolve().parent / "cities.csv"
+
+Point = Tuple[float, float]
+
+def haversine_km(lats: np.ndarray, lons: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    """Great-circle distances from (lat, lon) to each point, in km"""
+    lat1, lon1 = np.radians(lats), np.radians(lons)
+    lat2, lon2 = math.radians(lat), math.radians(lon)
+    a = np.sin((lat1 - lat2) / 2) ** 2 + np.cos(lat1) * math.cos(lat2) * np.sin((lon1 - lon2) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+class Gazetteer:
+    """
+    City name (and aliases) -> city centre coordinates; the single source of
+    city aliases, also used to canonicalize location text
+    """
+
+    def __init__(self, cities: Dict[str, Point], names: Dict[str, str], normalize):
+        self.normalize = normalize
+        self.cities = cities
+        # Normalized name or alias -> normalized city name
+        self.names = names
+
+    @classmethod
+    def from_csv(cls, path: Path, normalize) -> "Gazetteer":
+        """CSV with columns name, aliases ("|"-separated), latitude, longitude"""
+        cities: Dict[str, Point] = {}
+        names: Dict[str, str] = {}
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                point = (float(row["latitude"]), float(row["longitude"]))
+                city = normalize(row["name"])
+                for name in [row["name"], *filter(None, row["aliases"].split("|"))]:
+                    cities[normalize(name)] = point
+                    names[normalize(name)] = city
+        logger.info(f"Loaded {len(cities)} gazetteer names from {path}")
+        return cls(cities, names, normalize)
+
+    def signature(self) -> str:
+        """Content hash of the names and coordinates, to tell whether derived data is stale"""
+        payload = json.dumps([sorted(self.names.items()), sorted(self.cities.items())], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def canonical(self, location: Optional[str]) -> str:
+        """Normalized location, with a city alias replaced by the city's name ("спб" -> "санкт петербург")"""
+        normalized = self.normalize(location)
+        return self.names.get(normalized, normalized)
+
+    def resolve(self, location: Optional[str]) -> Optional[Point]:
+        """
+        Coordinates of a location: the whole string, else its first
+        comma-separated part ("Москва, ул. Тверская 5" -> Москва)
+        """
+        if not location:
+            return None
+        point = self.cities.get(self.normalize(location))
+        if point is None and "," in location:
+            point = self.cities.get(self.normalize(location.split(",", 1)[0]))
+        return point
+
+class GeoIndex:
+    """
+    Points bucketed into a lat/lon grid of `cell_deg` degrees (CSR layout).
+    Rows without coordinates (NaN) are never returned. Queries do not wrap
+    around the antimeridian.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float = 0.5):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_deg = cell_deg
+
+        rows = np.flatnonzero(~(np.isnan(self.lats) | np.isnan(self.lons)))
+        cell_lat = np.floor(self.lats[rows] / cell_deg).astype(np.int64)
+        cell_lon = np.floor(self.lons[rows] / cell_deg).astype(np.int64)
+        order = np.lexsort((cell_lon, cell_lat))
+        self.rows = rows[order]
+        keys = list(zip(cell_lat[order].tolist(), cell_lon[order].tolist()))
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        start = 0
+        for i in range(1, len(keys) + 1):
+            if i == len(keys) or keys[i] != keys[start]:
+                self.cells[keys[start]] = (start, i)
+                start = i
+        logger.info(f"Geo index: {len(self.rows)} located rows in {len(self.cells)} cells")
+
+    def distances(self, rows: np.ndarray, point: Point) -> np.ndarray:
+        """Distance in km from `point` to each row (NaN without coordinates)"""
+        return haversine_km(self.lats[rows], self.lons[rows], *point)
+
+    def _cells_in_box(self, point: Point, radius_km: float) -> List[Tuple[int, int]]:
+        lat, lon = point
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlon = radius_km / (KM_PER_DEGREE_LAT * max(0.01, math.cos(math.radians(lat))))
+        lat_range = range(math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg) + 1)
+        lon_range = range(math.floor((lon - dlon) / self.cell_deg), math.floor((lon + dlon) / self.cell_deg) + 1)
+        if len(lat_range) * len(lon_range) > len(self.cells):
+            # Box larger than the populated area: filter the populated cells instead
+            return [
+                key for key in self.cells
+                if lat_range.start <= key[0] < lat_range.stop and lon_range.start <= key[1] < lon_range.stop
+            ]
+        return [(a, b) for a in lat_range for b in lon_range if (a, b) in self.cells]
+
+    def within(self, point: Point, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, distances) of points within `radius_km`, rows sorted"""
+        spans = [self.cells[key] for key in self._cells_in_box(point, radius_km)]
+        if not spans:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        rows = np.sort(np.concatenate([self.rows[start:end] for start, end in spans]))
+        distances = self.distances(rows, point)
+        keep = distances <= radius_km
+        return rows[keep], distances[keep]
+
+    def nearest(
+        self,
+        point: Point,
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+        max_radius_km: float = 2 * math.pi * EARTH_RADIUS_KM
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, distances) of the k nearest points, nearest first, optionally
+        among the sorted `allowed` rows only. The search radius doubles from
+        one cell until k points are inside it.
+        """
+        radius = self.cell_deg * KM_PER_DEGREE_LAT
+        while True:
+            rows, distances = self.within(point, radius)
+            if allowed is not None:
+                keep = np.isin(rows, allowed, assume_unique=True)
+                rows, distances = rows[keep], distances[keep]
+            if len(rows) >= k or radius >= max_radius_km:
+                break
+            radius *= 2
+        order = np.argsort(distances, kind="stable")[:k]
+        return rows[order], distances[order]
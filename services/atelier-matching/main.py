@@ -5,15 +5,47 @@ ML-based matching of fashion designs with ateliers and tailors
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import os
+import asyncio
+import time
 import logging
 from datetime import datetime
+import numpy as np
+
+from atelier_index import AtelierIndex, normalize_location
+from geo import DEFAULT_GAZETTEER_PATH, Gazetteer
+from atelier_loader import bulk_load, load_snapshot, snapshot_is_current
+from portfolio import build_portfolio, load_portfolio
+
+import _paths  # puts shared/ on the import path in a source checkout
+from shared.analysis.design_analysis import DesignAnalyzer, DesignStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Offline city gazetteer (name,aliases,latitude,longitude) for resolving locations
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", str(DEFAULT_GAZETTEER_PATH))
+# Portfolio centroids built offline with `python portfolio.py build`; without it
+# they are encoded at startup for the mock directory only
+PORTFOLIO_PATH = os.getenv("PORTFOLIO_PATH")
+
+# Atelier directory dump (.jsonl/.ndjson/.csv/.parquet) loaded in bulk at startup, and the
+# snapshot directory written from it so restarts skip parsing and validation
+ATELIERS_PATH = os.getenv("ATELIERS_PATH")
+ATELIER_SNAPSHOT_PATH = os.getenv("ATELIER_SNAPSHOT_PATH")
+ATELIER_LOAD_BATCH = int(os.getenv("ATELIER_LOAD_BATCH", "1000"))
+ATELIER_LOAD_WORKERS = int(os.getenv("ATELIER_LOAD_WORKERS", str(os.cpu_count() or 1)))
+
+# Content-addressed design-analysis store shared with the search engine: a design
+# image analysed by either service (embedding + features) is reused by the other
+DESIGN_STORE = DesignStore(
+    os.getenv("DESIGN_STORE_PATH") or None,
+    max_entries=int(os.getenv("DESIGN_STORE_MAX_ENTRIES", "10000"))
+)
+DESIGN_ANALYZER = DesignAnalyzer(DESIGN_STORE)
+
 app = FastAPI(
     title="Atelier Matching Service",
     description="Matches fashion designs with ateliers and tailors",
@@ -32,6 +64,12 @@ class AtelierRequest(BaseModel):
     imageUrl: str
     location: Optional[str] = None
     budget: Optional[float] = None
+    currency: str = "RUB"  # currency of the budget
+    # Explicit coordinates take precedence over resolving `location`
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+    radius_km: Optional[float] = Field(default=None, gt=0)  # only ateliers within this distance
+    nearest_k: Optional[int] = Field(default=None, gt=0)  # only the k nearest matching ateliers
     max_results: int = 10
 
 class Atelier(BaseModel):
@@ -40,9 +78,14 @@ class Atelier(BaseModel):
     location: str
     specialization: List[str]
     priceRange: str
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None  # None: open-ended
+    currency: Optional[str] = None
     rating: float
     portfolioImages: List[str]
     contact: Optional[dict] = None
+    distance_km: Optional[float] = None  # from the requested location
+    portfolioSimilarity: Optional[float] = None  # design vs. atelier portfolio
     matchScore: float
 
 class AtelierResponse(BaseModel):
@@ -50,29 +93,6 @@ class AtelierResponse(BaseModel):
     query_time: float
     total_matches: int
 
-def extract_features(image_url: str) -> dict:
-    """
-    Extract features from fashion design image
-    TODO: Use ML classifier to determine:
-    - Category (dress, corset, suit, etc.)
-    - Complexity level
-    - Fabric type
-    - Decorative elements
-    """
-    # Placeholder: Return mock features
-    # In production:
-    # 1. Load image
-    # 2. Use ML classifier (CNN or Vision Transformer)
-    # 3. Extract category, complexity, fabric, decorations
-    # 4. Return structured features
-    
-    return {
-        "category": "dress",
-        "complexity": "medium",
-        "fabric_type": "satin",
-        "decorative_elements": ["embroidery", "beading"]
-    }
-
 def calculate_complexity_score(features: dict) -> float:
     """
     Calculate complexity score based on features
@@ -97,6 +117,8 @@ MOCK_ATELIERS = [
         "id": "1",
         "name": "Ателье Элегант",
         "location": "Москва",
+        "latitude": 55.7616,
+        "longitude": 37.6095,
         "specialization": ["вечерние платья", "свадебные платья", "корсеты"],
         "priceRange": "20000-50000 руб",
         "rating": 4.8,
@@ -116,6 +138,8 @@ MOCK_ATELIERS = [
         "id": "2",
         "name": "Мастерская Стиль",
         "location": "Санкт-Петербург",
+        "latitude": 59.9311,
+        "longitude": 30.3609,
         "specialization": ["повседневная одежда", "офисная одежда"],
         "priceRange": "10000-30000 руб",
         "rating": 4.6,
@@ -133,44 +157,57 @@ MOCK_ATELIERS = [
     # Add more mock ateliers...
 ]
 
-def match_atelier(features: dict, atelier: dict, location: Optional[str] = None, budget: Optional[float] = None) -> Optional[float]:
-    """
-    Calculate match score between design features and atelier capabilities
-    """
-    score = 0.0
-    
-    # Category match
-    if features["category"] in atelier.get("categories", []):
-        score += 0.4
-    else:
-        return None  # No match if category doesn't fit
-    
-    # Complexity match
-    complexity = features.get("complexity", "medium")
-    if complexity in atelier.get("complexity_range", []):
-        score += 0.3
-    
-    # Location match (if specified)
-    if location and location.lower() in atelier["location"].lower():
-        score += 0.2
-    
-    # Budget match (if specified)
-    if budget:
-        # Parse price range (simplified)
-        price_range = atelier["priceRange"]
-        # In production, parse actual range and check if budget fits
-        score += 0.1
-    
-    # Rating boost
-    rating_boost = (atelier["rating"] - 3.0) / 2.0 * 0.1  # Normalize 3-5 to 0-0.1
-    score += rating_boost
-    
-    return min(1.0, score)
+def load_directory(gazetteer: Gazetteer):
+    """(records, columns or None, load stats) from the snapshot, the bulk dump or the mock list"""
+    if ATELIER_SNAPSHOT_PATH and snapshot_is_current(ATELIER_SNAPSHOT_PATH, ATELIERS_PATH, gazetteer):
+        start = time.perf_counter()
+        records, columns = load_snapshot(ATELIER_SNAPSHOT_PATH)
+        return records, columns, {
+            "source": ATELIER_SNAPSHOT_PATH,
+            "snapshot": True,
+            "rows_loaded": len(records),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    if ATELIERS_PATH:
+        records, columns, stats = bulk_load(
+            ATELIERS_PATH,
+            gazetteer,
+            snapshot_path=ATELIER_SNAPSHOT_PATH,
+            batch_size=ATELIER_LOAD_BATCH,
+            workers=ATELIER_LOAD_WORKERS
+        )
+        return records, columns, {**stats.as_dict(), "snapshot": False}
+    return MOCK_ATELIERS, None, {"source": "mock", "snapshot": False, "rows_loaded": len(MOCK_ATELIERS)}
+
+GAZETTEER = Gazetteer.from_csv(GAZETTEER_PATH, normalize_location)
+ATELIER_RECORDS, ATELIER_COLUMNS, LOAD_STATS = load_directory(GAZETTEER)
+
+# Portfolio centroids are only encoded at startup for the in-memory mock directory
+if PORTFOLIO_PATH:
+    PORTFOLIO = load_portfolio(PORTFOLIO_PATH)
+elif ATELIER_RECORDS is MOCK_ATELIERS:
+    PORTFOLIO = build_portfolio(MOCK_ATELIERS)
+else:
+    PORTFOLIO = None
+    logger.warning("No PORTFOLIO_PATH for the loaded directory: portfolio similarity is disabled")
+
+# Inverted indexes over the directory, built once at load
+ATELIER_INDEX = AtelierIndex(ATELIER_RECORDS, GAZETTEER, PORTFOLIO, ATELIER_COLUMNS)
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "atelier-matching"}
 
+@app.get("/analysis/stats")
+async def analysis_stats():
+    """Shared design-analysis store hits, downloads and model runs"""
+    return await asyncio.to_thread(DESIGN_ANALYZER.stats)
+
+@app.get("/ateliers/stats")
+async def atelier_stats():
+    """Directory size and how it was loaded (rows/sec for bulk loads)"""
+    return {"ateliers": len(ATELIER_INDEX), **LOAD_STATS}
+
 @app.post("/match", response_model=AtelierResponse)
 async def match_ateliers(request: AtelierRequest):
     """
@@ -179,56 +216,61 @@ async def match_ateliers(request: AtelierRequest):
     try:
         start_time = datetime.now()
         
-        # Extract features from image
-        features = extract_features(request.imageUrl)
+        # Features and embedding of the design, from the shared analysis stage
+        analysis = await DESIGN_ANALYZER.analyze(request.imageUrl)
+        features = analysis.features
         logger.info(f"Extracted features: {features}")
         
-        # Match with ateliers
-        matched_ateliers = []
-        
-        for atelier in MOCK_ATELIERS:
-            match_score = match_atelier(
-                features,
-                atelier,
-                location=request.location,
-                budget=request.budget
-            )
-            
-            if match_score and match_score > 0.3:  # Minimum match threshold
-                matched_ateliers.append({
-                    **atelier,
-                    "matchScore": match_score
-                })
-        
-        # Sort by match score (descending)
-        matched_ateliers.sort(key=lambda x: x["matchScore"], reverse=True)
-        
-        # Limit results
-        results = matched_ateliers[:request.max_results]
+        # Score only the ateliers that make this category, fit the budget and are nearby
+        point = None
+        if request.latitude is not None and request.longitude is not None:
+            point = (request.latitude, request.longitude)
+        result = ATELIER_INDEX.match(
+            features,
+            location=request.location,
+            budget=request.budget,
+            max_results=request.max_results,
+            currency=request.currency.upper(),
+            point=point,
+            radius_km=request.radius_km,
+            nearest_k=request.nearest_k,
+            design_embedding=analysis.embedding
+        )
         
         # Convert to Atelier models
-        ateliers = [
-            Atelier(
+        ateliers = []
+        prices = ATELIER_INDEX.prices
+        for row, score, distance, similarity in zip(
+            result.rows.tolist(), result.scores.tolist(), result.distances.tolist(), result.similarities.tolist()
+        ):
+            a = ATELIER_INDEX.records[row]
+            price_min, price_max = float(prices.mins[row]), float(prices.maxs[row])
+            ateliers.append(Atelier(
                 id=a["id"],
                 name=a["name"],
                 location=a["location"],
                 specialization=a["specialization"],
                 priceRange=a["priceRange"],
+                price_min=None if np.isnan(price_min) else price_min,
+                price_max=None if np.isinf(price_max) or np.isnan(price_max) else price_max,
+                currency=prices.currencies[row],
                 rating=a["rating"],
                 portfolioImages=a["portfolioImages"],
                 contact=a.get("contact"),
-                matchScore=a["matchScore"]
-            )
-            for a in results
-        ]
+                distance_km=None if np.isnan(distance) else round(distance, 2),
+                portfolioSimilarity=None if np.isnan(similarity) else similarity,
+                matchScore=score
+            ))
         
         query_time = (datetime.now() - start_time).total_seconds()
         
         return AtelierResponse(
             ateliers=ateliers,
             query_time=query_time,
-            total_matches=len(matched_ateliers)
+            total_matches=result.total
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Atelier matching error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,171 @@
+"""
+Portfolio Embeddings
+Atelier portfolio images encoded offline into one centroid per atelier,
+stored as a compact int8 matrix (4x smaller than float32). At match time the
+design embedding is compared with every candidate's centroid in one
+vectorized pass; no portfolio image is touched per request.
+
+File layout (.npz):
+    ids             (N,) atelier ids
+    codes           (N, D) int8 L2-normalized centroids, quantized per dimension
+    scale           (D,) float32 dequantization scale
+    image_counts    (N,) int32 portfolio images per atelier (0 = no centroid)
+
+Build from atelier records (JSONL, one atelier per line):
+    python portfolio.py build ateliers.jsonl portfolio.npz
+"""
+
+from typing import Callable, Iterable, Iterator, List
+import argparse
+import json
+import logging
+import time
+import numpy as np
+
+import _paths  # puts shared/ on the import path in a source checkout
+from shared.analysis.design_analysis import EMBEDDING_DIM, embed_images, fetch_image
+
+logger = logging.getLogger(__name__)
+
+# Candidate rows decoded per chunk when scoring; small enough to stay in cache
+CHUNK_SIZE = 256
+
+def encode_images(image_urls: List[str]) -> np.ndarray:
+    """Portfolio images through the shared design-analysis encoder, so they share the design embedding space"""
+    return embed_images([fetch_image(url) for url in image_urls])
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class PortfolioMatrix:
+    """Per-atelier portfolio centroids as int8 codes, row i belonging to ids[i]"""
+
+    def __init__(self, ids: np.ndarray, codes: np.ndarray, scale: np.ndarray, image_counts: np.ndarray):
+        self.ids = np.asarray(ids)
+        self.codes = np.asarray(codes, dtype=np.int8)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.image_counts = np.asarray(image_counts, dtype=np.int32)
+
+    @classmethod
+    def from_centroids(cls, ids: np.ndarray, centroids: np.ndarray, image_counts: np.ndarray) -> "PortfolioMatrix":
+        """Symmetric int8 quantization with a per-dimension scale"""
+        max_abs = np.abs(centroids).max(axis=0) if len(centroids) else np.ones(centroids.shape[1])
+        max_abs[max_abs == 0] = 1.0
+        scale = (max_abs / 127.0).astype(np.float32)
+        codes = np.clip(np.rint(centroids / scale), -127, 127).astype(np.int8)
+        return cls(ids, codes, scale, image_counts)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    def aligned(self, atelier_ids: List[str]) -> "PortfolioMatrix":
+        """Re-ordered to the given ids; ateliers missing from the file get no centroid"""
+        position = {atelier_id: i for i, atelier_id in enumerate(self.ids.tolist())}
+        source = np.array([position.get(str(a), -1) for a in atelier_ids], dtype=np.int64)
+        found = source >= 0
+        codes = np.zeros((len(atelier_ids), self.dim), dtype=np.int8)
+        counts = np.zeros(len(atelier_ids), dtype=np.int32)
+        codes[found] = self.codes[source[found]]
+        counts[found] = self.image_counts[source[found]]
+        return PortfolioMatrix(np.array([str(a) for a in atelier_ids]), codes, self.scale, counts)
+
+    def similarity(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query to each row's centroid, clipped to [0, 1]; NaN without a portfolio"""
+        query = np.asarray(query, dtype=np.float32)
+        # q · (c * s) == (q * s) · c, so the scale is folded into the query once
+        scaled_query = (query / (np.linalg.norm(query) or 1.0) * self.scale).astype(np.float32)
+        sims = np.empty(len(rows), dtype=np.float64)
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = self.codes[rows[start:start + CHUNK_SIZE]]
+            sims[start:start + len(chunk)] = chunk.astype(np.float32) @ scaled_query
+        sims = np.clip(sims, 0.0, 1.0)
+        sims[self.image_counts[rows] == 0] = np.nan
+        return sims
+
+def build_portfolio(
+    records: Iterable[dict],
+    encode: Callable[[List[str]], np.ndarray] = encode_images,
+    batch_size: int = 64
+) -> PortfolioMatrix:
+    """
+    Encode every portfolio image in batches that span ateliers and average
+    the normalized embeddings into one normalized centroid per atelier
+    """
+    ids: List[str] = []
+    sums: List[np.ndarray] = []
+    counts: List[int] = []
+    pending_urls: List[str] = []
+    pending_rows: List[int] = []
+
+    def flush():
+        if not pending_urls:
+            return
+        embeddings = normalize_rows(np.asarray(encode(pending_urls), dtype=np.float32))
+        for row, embedding in zip(pending_rows, embeddings):
+            sums[row] += embedding
+        pending_urls.clear()
+        pending_rows.clear()
+
+    for record in records:
+        row = len(ids)
+        ids.append(str(record["id"]))
+        urls = list(dict.fromkeys(record.get("portfolioImages") or []))
+        sums.append(np.zeros(EMBEDDING_DIM, dtype=np.float32))
+        counts.append(len(urls))
+        for url in urls:
+            pending_urls.append(url)
+            pending_rows.append(row)
+            if len(pending_urls) >= batch_size:
+                flush()
+    flush()
+
+    centroids = normalize_rows(np.stack(sums)) if sums else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return PortfolioMatrix.from_centroids(np.array(ids), centroids, np.array(counts, dtype=np.int32))
+
+def write_portfolio(portfolio: PortfolioMatrix, path: str) -> None:
+    np.savez(
+        path,
+        ids=portfolio.ids.astype(str),
+        codes=portfolio.codes,
+        scale=portfolio.scale,
+        image_counts=portfolio.image_counts
+    )
+
+def load_portfolio(path: str) -> PortfolioMatrix:
+    with np.load(path, allow_pickle=False) as data:
+        portfolio = PortfolioMatrix(data["ids"], data["codes"], data["scale"], data["image_counts"])
+    logger.info(f"Loaded portfolio centroids for {len(portfolio)} ateliers from {path}, dim {portfolio.dim}")
+    return portfolio
+
+def read_atelier_records(input_path: str) -> Iterator[dict]:
+    with open(input_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Atelier portfolio embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Encode portfolio images into per-atelier centroids")
+    build.add_argument("input", help="JSONL file with one atelier per line (id, portfolioImages)")
+    build.add_argument("output", help="Output .npz file")
+    build.add_argument("--batch-size", type=int, default=64)
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    portfolio = build_portfolio(read_atelier_records(args.input), batch_size=args.batch_size)
+    write_portfolio(portfolio, args.output)
+    elapsed = time.perf_counter() - start
+    images = int(portfolio.image_counts.sum())
+    logger.info(f"Encoded {images} images for {len(portfolio)} ateliers into {args.output} in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+import pytest
+
+from atelier_index import AtelierIndex, normalize_location
+from atelier_loader import bulk_load, current_version, load_snapshot, snapshot_is_current
+from geo import DEFAULT_GAZETTEER_PATH, Gazetteer
+
+CITIES = ["Москва", "спб", "Казань, ул. Баумана 1", "Тверь", "Нигде"]
+CATEGORIES = ["dress", "suit", "coat", "skirt"]
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.from_csv(DEFAULT_GAZETTEER_PATH, normalize_location)
+
+@pytest.fixture
+def dump(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(300):
+        row = {
+            "id": f"a{i}",
+            "name": f"Ателье {i}",
+            "location": CITIES[i % len(CITIES)],
+            "specialization": ["вечерние платья"],
+            "priceRange": ["20000-50000 руб", "от 15 000 ₽", "до 300 $", "договорная"][i % 4],
+            "rating": round(float(rng.uniform(3, 5)), 1),
+            "portfolioImages": [f"https://img/{i}"],
+            "complexity_range": ["low", "medium", "high"][: 1 + i % 3],
+            "categories": list(rng.choice(CATEGORIES, size=2, replace=False)),
+            "contact": {"email": f"a{i}@example.com"},
+        }
+        if i % 10 == 0:
+            row.update(latitude=55.0 + i / 1000, longitude=37.0)
+        rows.append(row)
+    rows.append({**rows[0], "name": "duplicate"})
+    rows.append({**rows[1], "id": "bad", "rating": 9})
+    path = tmp_path / "ateliers.jsonl"
+    path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n", encoding="utf-8")
+    return str(path)
+
+def assert_columns_equal(a, b):
+    for field in a._fields:
+        left, right = getattr(a, field), getattr(b, field)
+        if isinstance(left, dict):
+            assert left.keys() == right.keys(), field
+            for key in left:
+                np.testing.assert_array_equal(left[key], right[key], err_msg=f"{field}[{key}]")
+        elif isinstance(left, list):
+            assert left == list(right), field
+        else:
+            np.testing.assert_array_equal(np.asarray(left), np.asarray(right), err_msg=field)
+
+def test_snapshot_load_equals_bulk_load(dump, tmp_path, gazetteer):
+    records, columns, stats = bulk_load(dump, gazetteer)
+    assert (stats.rows_loaded, stats.duplicates, stats.invalid) == (300, 1, 1)
+
+    snapshot = str(tmp_path / "snapshot")
+    written, written_columns, _ = bulk_load(dump, gazetteer, snapshot_path=snapshot)
+    mapped, mapped_columns = load_snapshot(snapshot)
+
+    assert list(written) == list(mapped) == records
+    assert_columns_equal(columns, written_columns)
+    assert_columns_equal(columns, mapped_columns)
+
+    features = {"category": "dress", "complexity": "medium"}
+    expected = AtelierIndex(records, gazetteer, columns=columns).match(features, "Москва", budget=40000)
+    actual = AtelierIndex(mapped, gazetteer, columns=mapped_columns).match(features, "Москва", budget=40000)
+    np.testing.assert_array_equal(expected.rows, actual.rows)
+    np.testing.assert_allclose(expected.scores, actual.scores)
+
+def test_parallel_validation_matches_serial(dump, gazetteer):
+    serial, _, _ = bulk_load(dump, gazetteer, batch_size=64)
+    parallel, _, stats = bulk_load(dump, gazetteer, batch_size=64, workers=2)
+    assert parallel == serial and stats.invalid == 1
+
+def test_snapshot_is_current_tracks_source_and_gazetteer(dump, tmp_path, gazetteer):
+    snapshot = str(tmp_path / "snapshot")
+    assert not snapshot_is_current(snapshot, dump, gazetteer)
+    bulk_load(dump, gazetteer, snapshot_path=snapshot)
+    assert snapshot_is_current(snapshot, dump, gazetteer)
+
+    other = Gazetteer(dict(gazetteer.cities), {**gazetteer.names, "первопрестольная": "москва"}, normalize_location)
+    assert not snapshot_is_current(snapshot, dump, other)
+
+    with open(dump, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert not snapshot_is_current(snapshot, dump, gazetteer)
+
+def test_republishing_keeps_current_and_previous_versions(dump, tmp_path, gazetteer):
+    snapshot = tmp_path / "snapshot"
+    versions = []
+    for _ in range(3):
+        bulk_load(dump, gazetteer, snapshot_path=str(snapshot))
+        versions.append(current_version(snapshot).name)
+    assert len(set(versions)) == 3
+    remaining = sorted(p.name for p in snapshot.iterdir() if p.is_dir())
+    assert remaining == sorted(versions[1:])
+    assert len(load_snapshot(str(snapshot))[0]) == 300
+
+def test_failed_load_keeps_published_snapshot(dump, tmp_path, gazetteer):
+    snapshot = tmp_path / "snapshot"
+    bulk_load(dump, gazetteer, snapshot_path=str(snapshot))
+    published = current_version(snapshot)
+    with open(dump, "a", encoding="utf-8") as f:
+        f.write("{broken\n")
+    with pytest.raises(ValueError):
+        bulk_load(dump, gazetteer, snapshot_path=str(snapshot))
+    assert current_version(snapshot) == published
+    assert [p for p in snapshot.iterdir() if p.is_dir()] == [published]
+    assert len(load_snapshot(str(snapshot))[0]) == 300
@@ -0,0 +1,36 @@
+import pytest
+
+import _paths  # puts shared/ on the import path in a source checkout
+from shared.schemas.atelier import Atelier, parse_price_range
+
+@pytest.mark.parametrize("text, expected", [
+    ("20000-50000 руб", (20000.0, 50000.0, "RUB")),
+    ("50000-20000 руб", (20000.0, 50000.0, "RUB")),
+    ("от 15 000 ₽", (15000.0, None, "RUB")),
+    ("from 200 USD", (200.0, None, "USD")),
+    ("до 30k", (0.0, 30000.0, "RUB")),
+    ("up to 300 eur", (0.0, 300.0, "EUR")),
+    ("1.5k-3k", (1500.0, 3000.0, "RUB")),
+    ("12,5k", (12500.0, 12500.0, "RUB")),
+    ("30 тыс", (30000.0, 30000.0, "RUB")),
+    ("5000", (5000.0, 5000.0, "RUB")),
+    ("15000 руб.", (15000.0, 15000.0, "RUB")),
+    ("5 000 – 10 000 €", (5000.0, 10000.0, "EUR")),
+    ("10 000—20 000 ₽", (10000.0, 20000.0, "RUB")),
+    ("$100-200", (100.0, 200.0, "USD")),
+])
+def test_parses_ranges(text, expected):
+    assert parse_price_range(text) == expected
+
+@pytest.mark.parametrize("text", ["договорная", "", None])
+def test_unparseable_ranges_keep_default_currency(text):
+    assert parse_price_range(text) == (None, None, "RUB")
+
+def test_atelier_parses_price_unless_given():
+    base = {
+        "id": "a1", "name": "A", "location": "Москва", "specialization": [], "rating": 4.0, "portfolioImages": [],
+    }
+    parsed = Atelier.model_validate({**base, "priceRange": "от 10k $"})
+    assert (parsed.price_min, parsed.price_max, parsed.currency) == (10000.0, None, "USD")
+    explicit = Atelier.model_validate({**base, "priceRange": "от 10k $", "price_min": 1.0, "price_max": 2.0})
+    assert (explicit.price_min, explicit.price_max, explicit.currency) == (1.0, 2.0, "RUB")
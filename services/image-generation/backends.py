@@ -0,0 +1,61 @@
+"""
+Generation Backends
+Batch interface to the image model. A backend turns a list of
+(prompt, seed) pairs that share model params into one image URL each.
+"""
+
+from typing import Dict, List, Type
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class GenerationBackend:
+    """Base class for image generation backends"""
+
+    name = "base"
+
+    async def generate_batch(self, prompts: List[str], seeds: List[int], params: dict) -> List[str]:
+        """Return one image URL per (prompt, seed), in order"""
+        raise NotImplementedError
+
+class StubBackend(GenerationBackend):
+    """
+    Placeholder model that simulates diffusion cost: a fixed per-batch
+    overhead plus a smaller per-image cost, so batching pays off as it
+    does on a GPU.
+    TODO: Integrate with actual AI model (SDXL/Flux via Replicate, HuggingFace, or local)
+    """
+
+    name = "stub"
+
+    def __init__(self, batch_overhead: float = 1.8, per_image: float = 0.2):
+        self.batch_overhead = batch_overhead
+        self.per_image = per_image
+
+    async def generate_batch(self, prompts: List[str], seeds: List[int], params: dict) -> List[str]:
+        await asyncio.sleep(self.batch_overhead + self.per_image * len(prompts))
+
+        # Placeholder: Return placeholder image URLs
+        # In production, this would:
+        # 1. Process prompt through style normalizer
+        # 2. Call AI model API (Replicate, HuggingFace Inference API, or local model)
+        # 3. Apply ControlNet for composition control
+        # 4. Upload to S3/CDN
+        # 5. Return public URL
+        size = f"{params.get('width', 512)}x{params.get('height', 512)}"
+        return [
+            f"https://via.placeholder.com/{size}/ec4899/ffffff?text={prompt[:20]}"
+            for prompt in prompts
+        ]
+
+BACKEND_TYPES: Dict[str, Type[GenerationBackend]] = {
+    StubBackend.name: StubBackend,
+}
+
+def create_backend(kind: str, **params) -> GenerationBackend:
+    """Instantiate a generation backend by name"""
+    if kind not in BACKEND_TYPES:
+        raise ValueError(f"Unknown generation backend: {kind}")
+    logger.info(f"Using {kind} generation backend with {params}")
+    return BACKEND_TYPES[kind](**params)
@@ -0,0 +1,150 @@
+"""
+Generation Batching
+Merges pending images from different requests that share model params
+(model, resolution) into one backend call. A batch is dispatched when it
+reaches `max_batch` images or its oldest image has waited `max_wait_ms`;
+while all backend slots are busy, newly queued images keep joining it.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import time
+
+from backends import GenerationBackend
+
+logger = logging.getLogger(__name__)
+
+Item = Tuple[str, int, asyncio.Future, float]
+
+class GenerationBatcher:
+    """Async front-end that batches calls to a GenerationBackend"""
+
+    def __init__(
+        self,
+        backend: GenerationBackend,
+        max_batch: int = 4,
+        max_wait_ms: float = 50.0,
+        workers: int = 2
+    ):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        # Bounds batches in flight (e.g. one per GPU)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[str, "asyncio.Queue[Item]"] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Strong references to running batches: the loop only keeps weak ones
+        self._inflight: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.total_wait = 0.0
+        self.total_batch_time = 0.0
+
+    async def generate(self, prompt: str, seed: int, params: dict) -> str:
+        """Queue one image and wait for its URL"""
+        key = json.dumps(params, sort_keys=True)
+        if self._slots is None:
+            # Created lazily so it binds to the running event loop
+            self._slots = asyncio.Semaphore(self.workers)
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            self._queues[key] = asyncio.Queue()
+            self._tasks[key] = asyncio.get_running_loop().create_task(self._run(key, params))
+        future = asyncio.get_running_loop().create_future()
+        self._queues[key].put_nowait((prompt, seed, future, time.perf_counter()))
+        return await future
+
+    async def _run(self, key: str, params: dict) -> None:
+        queue = self._queues[key]
+        batch: List[Item] = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                deadline = batch[0][3] + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._slots.acquire()
+                # Top up with images queued while waiting for a slot
+                while len(batch) < self.max_batch and not queue.empty():
+                    batch.append(queue.get_nowait())
+                # Drop images whose requests were cancelled meanwhile
+                batch = [item for item in batch if not item[2].done()]
+                if not batch:
+                    self._slots.release()
+                    continue
+                task = asyncio.get_running_loop().create_task(self._execute(batch, params))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # Stopped by close(): release callers of the batch being collected
+            for _, _, future, _ in batch:
+                future.cancel()
+            raise
+
+    async def _execute(self, batch: List[Item], params: dict) -> None:
+        try:
+            started = time.perf_counter()
+            self.total_wait += sum(started - queued_at for _, _, _, queued_at in batch)
+            try:
+                urls = await self.backend.generate_batch(
+                    [prompt for prompt, _, _, _ in batch],
+                    [seed for _, seed, _, _ in batch],
+                    params
+                )
+            except Exception as e:
+                logger.error(f"Batch generation failed: {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.total_batch_time += time.perf_counter() - started
+            self.batches += 1
+            self.items += len(batch)
+            if len(urls) != len(batch):
+                logger.error(f"Backend returned {len(urls)} images for a batch of {len(batch)}")
+            for (_, _, future, _), url in zip(batch, urls):
+                if not future.done():
+                    future.set_result(url)
+            # Requests left without an image must not wait forever
+            for _, _, future, _ in batch[len(urls):]:
+                if not future.done():
+                    future.set_exception(RuntimeError("Backend returned no image for this request"))
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        """Stop batching, let running batches finish and cancel queued images"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        for queue in self._queues.values():
+            while not queue.empty():
+                _, _, future, _ = queue.get_nowait()
+                future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": sum(q.qsize() for q in self._queues.values()),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "workers": self.workers,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "avg_queue_wait_ms": self.total_wait / self.items * 1000 if self.items else 0.0,
+            "avg_batch_ms": self.total_batch_time / self.batches * 1000 if self.batches else 0.0,
+        }
@@ -0,0 +1,69 @@
+"""
+Batching Benchmark
+Throughput and latency of the generation batcher against the stub backend
+for several max batch sizes. Backend costs are scaled down so the run
+takes seconds; only their ratio matters.
+
+Usage:
+    python benchmark_batching.py --images 400 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from backends import StubBackend
+from batcher import GenerationBatcher
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run(batcher: GenerationBatcher, images: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    counter = iter(range(images))
+    params = {"model": "stub", "width": 512, "height": 512}
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await batcher.generate(f"look {i}", i, params)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "images_per_s": images / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "avg_batch": batcher.stats()["avg_batch_size"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generation batching throughput")
+    parser.add_argument("--images", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32, help="images in flight")
+    parser.add_argument("--workers", type=int, default=2, help="concurrent backend batches")
+    parser.add_argument("--batch-overhead-ms", type=float, default=80.0)
+    parser.add_argument("--per-image-ms", type=float, default=20.0)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--batch-sizes", default="1,2,4,8")
+    args = parser.parse_args()
+
+    backend = StubBackend(args.batch_overhead_ms / 1000, args.per_image_ms / 1000)
+    print(
+        f"{args.images} images, concurrency {args.concurrency}, {args.workers} workers, "
+        f"cost {args.batch_overhead_ms} ms/batch + {args.per_image_ms} ms/image"
+    )
+    print(f"{'max_batch':<10} {'img/s':<10} {'p50 ms':<10} {'p99 ms':<10} {'avg batch':<10}")
+    for max_batch in (int(b) for b in args.batch_sizes.split(",")):
+        batcher = GenerationBatcher(backend, max_batch=max_batch, max_wait_ms=args.max_wait_ms, workers=args.workers)
+        r = asyncio.run(run(batcher, args.images, args.concurrency))
+        print(f"{max_batch:<10} {r['images_per_s']:<10.1f} {r['p50_ms']:<10.1f} {r['p99_ms']:<10.1f} {r['avg_batch']:<10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Prompt Enhancement Benchmark
+Compares the previous per-call string building with the compiled,
+memoized templates on a synthetic request corpus with Zipf-like
+popularity, once with requests repeated verbatim and once with a share of
+case, spacing and separator variants of the same requests.
+
+Usage:
+    python benchmark_prompts.py --requests 200000 --distinct 2000 --variant-rate 0.5
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+from prompt_templates import compile_prompt, enhance
+
+Request = Tuple[str, str, Optional[str], Optional[str], Optional[str]]
+
+PROMPTS = ["red silk dress", "black midi dress with lace", "linen summer suit", "velvet evening gown", "denim total look"]
+TYPES = ["dress", "total_look"]
+OCCASIONS = [None, "party", "office", "date", "casual", "formal"]
+PALETTES = [None, "red, black", "pastel pink", "navy, white, gold"]
+SILHOUETTES = [None, "a-line", "mermaid", "oversized"]
+
+def legacy_enhance(prompt: str, type: str, occasion: Optional[str], color_palette: Optional[str], silhouette: Optional[str]) -> str:
+    """The previous enhance_prompt, for comparison"""
+    occasion_map = {
+        "party": "elegant evening wear, sophisticated, glamorous",
+        "office": "professional, polished, business attire",
+        "date": "romantic, feminine, charming",
+        "casual": "relaxed, comfortable, everyday style",
+        "formal": "luxurious, refined, haute couture"
+    }
+    occasion_context = occasion_map.get(occasion, "")
+    type_context = "full body fashion photography" if type == "total_look" else "dress photography"
+    color_context = f", color palette: {color_palette}" if color_palette else ""
+    silhouette_context = f", silhouette: {silhouette}" if silhouette else ""
+    fashion_terms = "high fashion, editorial style, professional photography, studio lighting, detailed fabric texture"
+    enhanced = f"{prompt}, {occasion_context}, {type_context}{color_context}{silhouette_context}, {fashion_terms}"
+    return enhanced.strip()
+
+def variant(text: Optional[str], rng: random.Random) -> Optional[str]:
+    """Same value as a user might type it"""
+    if text is None:
+        return None
+    text = text.upper() if rng.random() < 0.2 else text
+    text = text.replace(", ", rng.choice([", ", ",", " ,  "]))
+    return rng.choice(["", " "]) + text + rng.choice(["", " ", "."])
+
+def make_corpus(n: int, distinct: int, variant_rate: float, seed: int = 0) -> List[Request]:
+    rng = random.Random(seed)
+    base = [
+        (f"{rng.choice(PROMPTS)} {i % 50}", rng.choice(TYPES), rng.choice(OCCASIONS), rng.choice(PALETTES), rng.choice(SILHOUETTES))
+        for i in range(distinct)
+    ]
+    # Zipf-like popularity: a few looks are requested far more often
+    weights = [1.0 / (rank + 1) for rank in range(distinct)]
+    picks = rng.choices(base, weights=weights, k=n)
+    corpus = []
+    for prompt, type, occasion, palette, silhouette in picks:
+        if rng.random() < variant_rate:
+            prompt, occasion, palette, silhouette = (variant(v, rng) for v in (prompt, occasion, palette, silhouette))
+        corpus.append((prompt, type, occasion, palette, silhouette))
+    return corpus
+
+def measure(fn, corpus: List[Request]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    outputs = [fn(*r) for r in corpus]
+    return len(corpus) / (time.perf_counter() - start), len(set(outputs))
+
+def rate_label(rate: float) -> str:
+    return f"{rate:.0%} var"
+
+def hit_rate(info) -> str:
+    lookups = info.hits + info.misses
+    return f"{info.hits / lookups:.1%}" if lookups else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt enhancement throughput")
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=2000, help="distinct underlying looks")
+    parser.add_argument("--variant-rate", type=float, default=0.5, help="share of requests typed differently")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests over {args.distinct} distinct looks")
+    print(f"{'corpus':<10} {'mode':<10} {'req/s':<12} {'distinct prompts':<18} {'raw memo':<10} {'canonical memo':<14}")
+    for corpus_name, rate in [("verbatim", 0.0), (f"{rate_label(args.variant_rate)}", args.variant_rate)]:
+        corpus = make_corpus(args.requests, args.distinct, rate)
+        for mode, fn in [("legacy", legacy_enhance), ("compiled", enhance)]:
+            compile_prompt.cache_clear()
+            enhance.cache_clear()
+            rps, distinct = measure(fn, corpus)
+            memo = ("", "")
+            if fn is enhance:
+                memo = (hit_rate(enhance.cache_info()), hit_rate(compile_prompt.cache_info()))
+            print(f"{corpus_name:<10} {mode:<10} {rps:<12.0f} {distinct:<18} {memo[0]:<10} {memo[1]:<14}")
+
+if __name__ == "__main__":
+    main()
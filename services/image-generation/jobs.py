@@ -0,0 +1,238 @@
+"""
+Generation Jobs
+Asynchronous generation jobs: submit returns a job id at once, images are
+recorded as they finish and pushed to subscribers (SSE), jobs can be
+cancelled and expire after a TTL. Job records live in memory or in SQLite.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATES = {COMPLETED, FAILED, CANCELLED}
+
+class MemoryJobStore:
+    """Job records in a dict"""
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    def save(self, job: dict) -> None:
+        self._jobs[job["job_id"]] = job
+
+    def delete_expired(self, before: float) -> int:
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in TERMINAL_STATES and job["updated_at"] < before
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+class SQLiteJobStore:
+    """
+    Job records as JSON rows in SQLite, so status and results survive a restart.
+    Jobs that were still running when the process stopped are marked failed.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._interrupt_unfinished()
+
+    def _interrupt_unfinished(self) -> None:
+        rows = self._conn.execute(
+            "SELECT data FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+        for (data,) in rows:
+            job = json.loads(data)
+            job.update(status=FAILED, error="Interrupted by service restart", updated_at=time.time())
+            self.save(job)
+        if rows:
+            logger.warning(f"Marked {len(rows)} unfinished jobs as failed")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, job: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, updated_at, data) VALUES (?, ?, ?, ?)",
+                (job["job_id"], job["status"], job["updated_at"], json.dumps(job, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def delete_expired(self, before: float) -> int:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*TERMINAL_STATES, before)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+def create_job_store(path: Optional[str]):
+    """SQLite store at `path`, or an in-memory store when no path is given"""
+    return SQLiteJobStore(path) if path else MemoryJobStore()
+
+class JobManager:
+    """
+    Runs generation jobs in the background.
+    `generate(job_id, prompt, seed)` produces one image URL; it is called
+    concurrently for every image of a job.
+    Store calls run on a single I/O thread, off the event loop and in the
+    order they were issued, so a job's later state is never overwritten.
+    """
+
+    def __init__(
+        self,
+        store,
+        generate: Callable[[str, str, int], Awaitable[str]],
+        ttl: float = 3600.0
+    ):
+        self.store = store
+        self.generate = generate
+        self.ttl = ttl
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._listeners: Dict[str, List[asyncio.Queue]] = {}
+        self._last_purge = 0.0
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    async def _store(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, method, *args)
+
+    async def purge_expired(self) -> None:
+        """Drop finished jobs older than the TTL (at most once a minute)"""
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        removed = await self._store(self.store.delete_expired, now - self.ttl)
+        if removed:
+            logger.info(f"Expired {removed} jobs")
+
+    async def submit(self, prompt_enhanced: str, seeds: List[int], request: dict) -> dict:
+        await self.purge_expired()
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "num_images": len(seeds),
+            "images": [None] * len(seeds),
+            "seeds": seeds,
+            "prompt_enhanced": prompt_enhanced,
+            "error": None,
+            "request": request,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self._store(self.store.save, dict(job, images=list(job["images"])))
+        self._tasks[job["job_id"]] = asyncio.ensure_future(self._run(job))
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        await self.purge_expired()
+        return await self._store(self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.wait([task])
+        return await self._store(self.store.get, job_id)
+
+    async def _update(self, job: dict, event: str, index: Optional[int] = None, **changes) -> None:
+        job.update(changes, updated_at=time.time())
+        # Saved from a copy: other images of the job keep landing meanwhile
+        await self._store(self.store.save, dict(job, images=list(job["images"])))
+        data = {"job_id": job["job_id"], "status": job["status"]}
+        if event == "image":
+            data.update(image_index=index, image=job["images"][index], seed=job["seeds"][index])
+        elif job["error"]:
+            data["error"] = job["error"]
+        for queue in self._listeners.get(job["job_id"], ()):
+            queue.put_nowait((event, data))
+
+    async def _run(self, job: dict) -> None:
+        job_id = job["job_id"]
+        await self._update(job, "status", status=RUNNING)
+
+        async def one(index: int, seed: int):
+            url = await self.generate(job_id, job["prompt_enhanced"], seed)
+            job["images"][index] = url
+            await self._update(job, "image", index=index)
+
+        tasks = [asyncio.ensure_future(one(i, seed)) for i, seed in enumerate(job["seeds"])]
+        try:
+            await asyncio.gather(*tasks)
+            await self._update(job, COMPLETED, status=COMPLETED)
+        except asyncio.CancelledError:
+            await self._update(job, CANCELLED, status=CANCELLED)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await self._update(job, FAILED, status=FAILED, error=str(e))
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._tasks.pop(job_id, None)
+
+    async def events(self, job_id: str) -> AsyncIterator[tuple]:
+        """
+        (event, data) pairs for a job: images already finished first, then
+        each new image as it is ready, ending with the terminal status.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, []).append(queue)
+        try:
+            job = await self._store(self.store.get, job_id)
+            if job is None:
+                return
+            sent = set()
+            for index, url in enumerate(job["images"]):
+                if url is not None:
+                    sent.add(index)
+                    yield "image", {"job_id": job_id, "status": job["status"], "image_index": index, "image": url, "seed": job["seeds"][index]}
+            if job["status"] in TERMINAL_STATES:
+                yield job["status"], {"job_id": job_id, "status": job["status"], "error": job["error"]}
+                return
+            while True:
+                event, data = await queue.get()
+                if event == "image":
+                    if data["image_index"] in sent:
+                        continue
+                    sent.add(data["image_index"])
+                yield event, data
+                if event in TERMINAL_STATES:
+                    return
+        finally:
+            listeners = self._listeners.get(job_id, [])
+            if queue in listeners:
+                listeners.remove(queue)
+            if not listeners:
+                self._listeners.pop(job_id, None)
@@ -5,20 +5,72 @@ Handles text-to-image generation using AI models
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import List, Optional
 import os
+import json
 import logging
 import asyncio
+import uuid
 from datetime import datetime
 
+from backends import create_backend
+from batcher import GenerationBatcher
+from jobs import JobManager, create_job_store
+from prompt_templates import compile_prompt, enhance
+from result_cache import ResultCache, result_key, stable_seed
+from scheduler import GenerationScheduler
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Service-wide cap on concurrent generations (GPU / model API slots)
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("GENERATION_MAX_CONCURRENT", "8"))
+SCHEDULER = GenerationScheduler(max_concurrent=MAX_CONCURRENT_GENERATIONS)
+
+# Generation jobs: SQLite file for the job store (in-memory when unset)
+# and how long finished jobs are kept, in seconds
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))
+
+# Everything besides prompt and seed that changes the output image; part of the cache key
+MODEL_PARAMS = {
+    "model": os.getenv("GENERATION_MODEL", "placeholder"),
+    "width": 512,
+    "height": 512,
+}
+
+# Model backend (in production Stable Diffusion XL, Flux, or a custom fine-tuned model)
+# and dynamic batching: images sharing model params are merged into one backend call
+GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "stub")
+BATCHER = GenerationBatcher(
+    create_backend(GENERATION_BACKEND),
+    max_batch=int(os.getenv("GENERATION_MAX_BATCH", "4")),
+    max_wait_ms=float(os.getenv("GENERATION_BATCH_WAIT_MS", "50")),
+    workers=int(os.getenv("GENERATION_BATCH_WORKERS", "2"))
+)
+
+# Generated image cache: in-memory entries plus an optional SQLite tier bounded in bytes
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", "10000")),
+    disk_path=os.getenv("RESULT_CACHE_PATH") or None,
+    disk_max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(1024 ** 3)))
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        yield
+    finally:
+        await BATCHER.close()
+
 app = FastAPI(
     title="Image Generation Service",
     description="Generates fashion images from text prompts",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -46,61 +98,47 @@ class GenerationResponse(BaseModel):
     prompt_enhanced: str
     generation_time: float
 
-# Placeholder for actual AI model integration
-# In production, this would use Stable Diffusion XL, Flux, or custom fine-tuned model
+class JobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed or cancelled
+    num_images: int
+    images: List[Optional[str]]  # None until that image is ready
+    seeds: List[int]
+    prompt_enhanced: str
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
 async def generate_image(prompt: str, seed: Optional[int] = None) -> str:
     """
     Generate a single image from prompt
-    TODO: Integrate with actual AI model (SDXL/Flux via Replicate, HuggingFace, or local)
+    Batched with concurrent images that share the model params
     """
-    # Simulate generation delay
-    await asyncio.sleep(2)
-    
-    # Placeholder: Return a placeholder image URL
-    # In production, this would:
-    # 1. Process prompt through style normalizer
-    # 2. Call AI model API (Replicate, HuggingFace Inference API, or local model)
-    # 3. Apply ControlNet for composition control
-    # 4. Upload to S3/CDN
-    # 5. Return public URL
-    
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    placeholder_url = f"https://via.placeholder.com/512x512/ec4899/ffffff?text={prompt[:20]}"
-    
-    return placeholder_url
+    return await BATCHER.generate(prompt, seed, MODEL_PARAMS)
 
 def enhance_prompt(request: GenerationRequest) -> str:
     """
     Enhance user prompt with style normalization and fashion-specific terms
+    Equivalent requests (case, spacing, list separators) give the same prompt
     """
-    base_prompt = request.prompt
-    
-    # Add occasion context
-    occasion_map = {
-        "party": "elegant evening wear, sophisticated, glamorous",
-        "office": "professional, polished, business attire",
-        "date": "romantic, feminine, charming",
-        "casual": "relaxed, comfortable, everyday style",
-        "formal": "luxurious, refined, haute couture"
-    }
-    
-    occasion_context = occasion_map.get(request.occasion, "")
-    
-    # Add type context
-    type_context = "full body fashion photography" if request.type == "total_look" else "dress photography"
-    
-    # Add color palette
-    color_context = f", color palette: {request.colorPalette}" if request.colorPalette else ""
-    
-    # Add silhouette
-    silhouette_context = f", silhouette: {request.silhouette}" if request.silhouette else ""
-    
-    # Fashion-specific enhancements
-    fashion_terms = "high fashion, editorial style, professional photography, studio lighting, detailed fabric texture"
-    
-    enhanced = f"{base_prompt}, {occasion_context}, {type_context}{color_context}{silhouette_context}, {fashion_terms}"
-    
-    return enhanced.strip()
+    return enhance(request.prompt, request.type, request.occasion, request.colorPalette, request.silhouette)
+
+def derive_seeds(request: GenerationRequest, enhanced_prompt: str) -> List[int]:
+    seeds = []
+    for i in range(request.num_images):
+        seed = request.seed if request.seed is not None else stable_seed(enhanced_prompt, i)
+        seeds.append(seed)
+    return seeds
+
+async def scheduled_image(owner: str, prompt: str, seed: int) -> str:
+    """
+    One image from the result cache, or generated through the shared
+    scheduler (queued under `owner`) and cached
+    """
+    key = result_key(prompt, seed, MODEL_PARAMS)
+    return await RESULT_CACHE.fetch(key, lambda: SCHEDULER.submit(owner, lambda: generate_image(prompt, seed)))
+
+JOBS = JobManager(create_job_store(JOB_STORE_PATH), scheduled_image, ttl=JOB_TTL)
 
 @app.get("/health")
 async def health_check():
@@ -118,18 +156,17 @@ async def generate(request: GenerationRequest):
         enhanced_prompt = enhance_prompt(request)
         logger.info(f"Enhanced prompt: {enhanced_prompt}")
         
-        # Generate multiple images
-        seeds = []
-        images = []
+        seeds = derive_seeds(request, enhanced_prompt)
         
-        for i in range(request.num_images):
-            seed = request.seed if request.seed else None
-            if seed is None:
-                seed = hash(enhanced_prompt + str(i)) % (2**32)
-            
-            image_url = await generate_image(enhanced_prompt, seed)
-            images.append(image_url)
-            seeds.append(seed)
+        # Generate the images concurrently through the shared scheduler
+        request_id = uuid.uuid4().hex
+        tasks = [asyncio.ensure_future(scheduled_image(request_id, enhanced_prompt, seed)) for seed in seeds]
+        try:
+            images = list(await asyncio.gather(*tasks))
+        finally:
+            # On failure or client disconnect, drop the request's remaining work
+            for task in tasks:
+                task.cancel()
         
         generation_time = (datetime.now() - start_time).total_seconds()
         
@@ -143,6 +180,76 @@ async def generate(request: GenerationRequest):
         logger.error(f"Generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: GenerationRequest):
+    """
+    Start a generation job and return at once.
+    Poll GET /jobs/{job_id} or stream GET /jobs/{job_id}/events for results.
+    """
+    enhanced_prompt = enhance_prompt(request)
+    job = await JOBS.submit(enhanced_prompt, derive_seeds(request, enhanced_prompt), request.model_dump())
+    logger.info(f"Submitted job {job['job_id']} ({job['num_images']} images)")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Job status with the images finished so far"""
+    job = await JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events: one "image" event per image as soon as it is ready,
+    then a final "completed", "failed" or "cancelled" event.
+    """
+    if await JOBS.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def stream():
+        async for event, data in JOBS.events(job_id):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = await JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Generation result cache counters"""
+    return RESULT_CACHE.stats()
+
+@app.get("/batcher/stats")
+async def batcher_stats():
+    """Batch sizes and queue wait of the generation backend"""
+    return BATCHER.stats()
+
+@app.get("/prompts/stats")
+async def prompt_stats():
+    """Enhanced-prompt memo counters"""
+    info = compile_prompt.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """Queue depth, running generations and queue wait times"""
+    return SCHEDULER.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
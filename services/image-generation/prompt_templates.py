@@ -0,0 +1,96 @@
+"""
+Prompt Templates
+Compiled prompt enhancement: fragment tables are built once at import,
+requests are canonicalized (whitespace, list separators, case of the
+fixed-vocabulary fields) so that equivalent requests yield an identical
+enhanced prompt, and compiled prompts are memoized on the canonical
+request tuple. A second memo on the raw fields skips canonicalization
+for requests seen verbatim before.
+"""
+
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Occasion context
+OCCASION_FRAGMENTS = {
+    "party": "elegant evening wear, sophisticated, glamorous",
+    "office": "professional, polished, business attire",
+    "date": "romantic, feminine, charming",
+    "casual": "relaxed, comfortable, everyday style",
+    "formal": "luxurious, refined, haute couture",
+}
+
+# Type context; any type other than a total look is shot as a dress
+TYPE_FRAGMENTS = {
+    "total_look": "full body fashion photography",
+}
+DEFAULT_TYPE_FRAGMENT = "dress photography"
+
+# Fashion-specific enhancements
+FASHION_TERMS = "high fashion, editorial style, professional photography, studio lighting, detailed fabric texture"
+
+PROMPT_CACHE_SIZE = 4096
+RAW_CACHE_SIZE = 16384
+
+_EDGE_PUNCTUATION = " ,;."
+_LIST_SEPARATORS = str.maketrans({"/": ",", ";": ","})
+
+CanonicalRequest = Tuple[str, str, str, str, str]
+
+def _clean_text(text: Optional[str], lower: bool = True) -> str:
+    """Collapse whitespace, trim separators at the ends and (by default) lowercase"""
+    if not text:
+        return ""
+    text = " ".join(text.split()).strip(_EDGE_PUNCTUATION)
+    return text.lower() if lower else text
+
+def _clean_list(text: Optional[str]) -> str:
+    """Comma/slash separated list: cleaned items, duplicates dropped, order kept"""
+    if not text:
+        return ""
+    items = (_clean_text(item) for item in text.translate(_LIST_SEPARATORS).split(","))
+    return ", ".join(dict.fromkeys(item for item in items if item))
+
+def canonicalize(
+    prompt: str,
+    type: Optional[str],
+    occasion: Optional[str] = None,
+    color_palette: Optional[str] = None,
+    silhouette: Optional[str] = None
+) -> CanonicalRequest:
+    """
+    Canonical form of the fields that shape the prompt. The free-text prompt
+    keeps its case (not every text encoder is case-insensitive); the fixed
+    vocabulary fields are lowercased.
+    """
+    return (
+        _clean_text(prompt, lower=False),
+        _clean_text(type).replace(" ", "_"),
+        _clean_text(occasion),
+        _clean_list(color_palette),
+        _clean_text(silhouette),
+    )
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def compile_prompt(request: CanonicalRequest) -> str:
+    """Join the non-empty fragments of a canonical request"""
+    prompt, type, occasion, color_palette, silhouette = request
+    fragments = [
+        prompt,
+        OCCASION_FRAGMENTS.get(occasion, ""),
+        TYPE_FRAGMENTS.get(type, DEFAULT_TYPE_FRAGMENT),
+        f"color palette: {color_palette}" if color_palette else "",
+        f"silhouette: {silhouette}" if silhouette else "",
+        FASHION_TERMS,
+    ]
+    return ", ".join(fragment for fragment in fragments if fragment)
+
+@lru_cache(maxsize=RAW_CACHE_SIZE)
+def enhance(
+    prompt: str,
+    type: Optional[str],
+    occasion: Optional[str] = None,
+    color_palette: Optional[str] = None,
+    silhouette: Optional[str] = None
+) -> str:
+    return compile_prompt(canonicalize(prompt, type, occasion, color_palette, silhouette))
@@ -0,0 +1,218 @@
+"""
+Generation Result Cache
+Content-addressed cache of generated images. A result is fully determined
+by (enhanced prompt, seed, model params), so the key is a hash of those.
+In-memory LRU in front of an optional SQLite tier bounded by total bytes
+(least recently used entries are evicted first). Identical in-flight
+generations are coalesced into one, and disk I/O runs in a worker thread.
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def stable_seed(prompt: str, index: int) -> int:
+    """Seed for image `index` of a prompt, identical across processes and restarts"""
+    digest = hashlib.sha256(f"{prompt}\x00{index}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big")
+
+def result_key(prompt: str, seed: int, params: dict) -> str:
+    payload = json.dumps({"prompt": prompt, "seed": seed, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskTier:
+    """
+    SQLite tier bounded by total result bytes, evicting least recently used.
+    Access times are refreshed at most every `touch_interval` seconds per
+    entry, so most hits are a read without a write transaction.
+    """
+
+    def __init__(self, path: str, max_bytes: int, touch_interval: float = 300.0):
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+        self._conn.commit()
+        self.current_bytes = self._total_bytes()
+        self.evictions = 0
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, accessed_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > self.touch_interval:
+                self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            # A replaced entry's bytes are freed, so only the size difference is added
+            row = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self._conn.commit()
+            self.current_bytes += len(value) - (row[0] if row else 0)
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes may share the file, so recount before evicting
+        self.current_bytes = self._total_bytes()
+        while self.current_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            freed = 0
+            for key, size in rows:
+                if self.current_bytes - freed <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                freed += size
+                self.evictions += 1
+            self.current_bytes -= freed
+        self._conn.commit()
+
+class ResultCache:
+    """In-memory LRU backed by an optional size-bounded disk tier"""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 1024 ** 3,
+        disk_touch_interval: float = 300.0
+    ):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self.disk = DiskTier(disk_path, disk_max_bytes, disk_touch_interval) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                value = blob.decode("utf-8")
+                self._put_memory(key, value)
+                self.disk_hits += 1
+                return value
+        return None
+
+    def _put_memory(self, key: str, value: str) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key: str, value: str) -> None:
+        self._put_memory(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value.encode("utf-8"))
+
+    async def fetch(self, key: str, loader: Callable[[], Awaitable[str]]) -> str:
+        """
+        Cached result, or the result of one disk lookup or `loader` call
+        shared by all concurrent callers; it is cancelled only when every caller is.
+        """
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if key in self._waiters and not task.done():
+                self._waiters[key] -= 1
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[str]]) -> str:
+        if self.disk is not None:
+            blob = await asyncio.to_thread(self.disk.get, key)
+            if blob is not None:
+                value = blob.decode("utf-8")
+                self._put_memory(key, value)
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        value = await loader()
+        self._put_memory(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, value.encode("utf-8"))
+        return value
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        self._waiters.pop(key, None)
+
+    def stats(self) -> dict:
+        # Coalesced callers shared a lookup already counted once, so they stay out of hit_rate
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_bytes": self.disk.current_bytes if self.disk is not None else None,
+            "disk_evictions": self.disk.evictions if self.disk is not None else None,
+        }
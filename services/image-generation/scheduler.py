@@ -0,0 +1,101 @@
+"""
+Generation Scheduler
+Service-wide cap on in-flight image generations with fair queuing:
+queued work is dispatched round-robin across requests, so one large
+request cannot starve the others.
+"""
+
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Tuple, TypeVar
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Job = Tuple[Callable[[], Awaitable], asyncio.Future, float]
+
+class GenerationScheduler:
+    """Bounded worker pool with per-owner FIFO queues served round-robin"""
+
+    def __init__(self, max_concurrent: int = 8, wait_window: int = 1000):
+        self.max_concurrent = max_concurrent
+        self._queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._waits: Deque[float] = deque(maxlen=wait_window)
+        self.max_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def submit(self, owner: str, job: Callable[[], Awaitable[T]]) -> T:
+        """Queue `job` for `owner` (e.g. a request id) and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(owner, deque()).append((job, future, time.perf_counter()))
+        self._dispatch()
+        return await future
+
+    def _next_job(self):
+        while self._queues:
+            owner, queue = self._queues.popitem(last=False)
+            job = queue.popleft()
+            if queue:
+                # Owner goes to the back of the line
+                self._queues[owner] = queue
+            if not job[1].done():
+                return job
+            self.cancelled += 1
+        return None
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrent:
+            job = self._next_job()
+            if job is None:
+                return
+            self.running += 1
+            task = asyncio.ensure_future(self._run(*job))
+            # A waiter that goes away cancels its running generation
+            job[1].add_done_callback(lambda f, task=task: task.cancel() if f.cancelled() else None)
+
+    async def _run(self, job: Callable[[], Awaitable], future: asyncio.Future, enqueued_at: float) -> None:
+        wait = time.perf_counter() - enqueued_at
+        self._waits.append(wait)
+        self.max_wait = max(self.max_wait, wait)
+        try:
+            result = await job()
+            self.completed += 1
+            if not future.done():
+                future.set_result(result)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            if not future.done():
+                future.cancel()
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Generation job failed: {e}")
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self.running -= 1
+            self._dispatch()
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "queued_requests": len(self._queues),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "wait_ms_avg": 1000 * sum(waits) / len(waits) if waits else 0.0,
+            "wait_ms_p95": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "wait_ms_max": 1000 * self.max_wait,
+        }
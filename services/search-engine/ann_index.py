@@ -0,0 +1,299 @@
+"""
+Approximate Nearest-Neighbour Indexes
+NumPy implementations of IVF-flat and HNSW over L2-normalized embeddings.
+
+Both backends rank by inner product, which equals cosine similarity
+for normalized vectors.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import heapq
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ANNIndex:
+    """Base class for approximate nearest-neighbour indexes"""
+
+    name = "base"
+
+    def build(self, embeddings: np.ndarray) -> "ANNIndex":
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row ids, similarities) of up to k nearest rows, best first.
+        `allowed` is an optional (N,) bool mask; other rows are never returned.
+        """
+        raise NotImplementedError
+
+    def params(self) -> dict:
+        return {}
+
+def _top_k(ids: np.ndarray, sims: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if k < sims.size:
+        part = np.argpartition(-sims, k - 1)[:k]
+        ids, sims = ids[part], sims[part]
+    order = np.argsort(-sims, kind="stable")
+    return ids[order], sims[order]
+
+def spherical_kmeans(
+    data: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    K-means on the unit sphere (assign by max inner product, re-normalize centroids)
+    Returns (n_clusters, D) float32 centroids.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        counts = np.bincount(assignment, minlength=n_clusters)
+
+        # Re-seed empty clusters from random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+class IVFFlatIndex(ANNIndex):
+    """
+    Inverted-file index with a k-means coarse quantizer.
+    Vectors are stored un-compressed, grouped contiguously by list.
+
+    Knobs:
+    - n_lists: number of coarse clusters (≈ sqrt(N) is a good start)
+    - nprobe: lists scanned per query (higher = better recall, slower)
+    """
+
+    name = "ivf"
+
+    def __init__(self, n_lists: int = 256, nprobe: int = 8, train_size: int = 100_000, n_iter: int = 20):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.n_iter = n_iter
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.list_ids: Optional[np.ndarray] = None
+        self.list_vectors: Optional[np.ndarray] = None
+
+    def build(self, embeddings: np.ndarray) -> "IVFFlatIndex":
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        rng = np.random.default_rng(0)
+        if len(embeddings) > self.train_size:
+            train = embeddings[rng.choice(len(embeddings), self.train_size, replace=False)]
+        else:
+            train = embeddings
+        self.centroids = spherical_kmeans(train, self.n_lists, n_iter=self.n_iter)
+
+        # Assign in chunks to bound the (N, n_lists) temporary
+        assignment = np.empty(len(embeddings), dtype=np.int64)
+        for start in range(0, len(embeddings), 65536):
+            chunk = embeddings[start:start + 65536]
+            assignment[start:start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+
+        # CSR layout: list_ids[list_offsets[l]:list_offsets[l + 1]] belong to list l
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.list_ids = order
+        self.list_vectors = embeddings[order]
+        return self
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_sims = self.centroids @ query
+        probe = np.argpartition(-centroid_sims, nprobe - 1)[:nprobe]
+
+        positions = np.concatenate([
+            np.arange(self.list_offsets[l], self.list_offsets[l + 1]) for l in probe
+        ])
+        if allowed is not None:
+            # Filter before computing distances, so selective filters do less work
+            positions = positions[allowed[self.list_ids[positions]]]
+        if positions.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        sims = self.list_vectors[positions] @ query
+        return _top_k(self.list_ids[positions], sims, k)
+
+    def params(self) -> dict:
+        return {"n_lists": self.n_lists, "nprobe": self.nprobe}
+
+class HNSWIndex(ANNIndex):
+    """
+    Hierarchical Navigable Small World graph.
+
+    Knobs:
+    - M: max neighbours per node on upper layers (2*M on layer 0)
+    - ef_construction: candidate list size while inserting
+    - ef_search: candidate list size while querying (higher = better recall, slower)
+    """
+
+    name = "hnsw"
+
+    def __init__(self, M: int = 16, ef_construction: int = 100, ef_search: int = 64, seed: int = 0):
+        if M < 2:
+            # The level multiplier is 1 / ln(M)
+            raise ValueError(f"HNSW M must be at least 2, got {M}")
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.level_mult = 1.0 / np.log(M)
+        self.rng = np.random.default_rng(seed)
+        self.vectors: Optional[np.ndarray] = None
+        self.layers: List[Dict[int, List[int]]] = []
+        self.entry_point: Optional[int] = None
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[int],
+        ef: int,
+        layer: int,
+        allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        """
+        Greedy best-first search on one layer. Returns (sim, id) sorted best first.
+        With `allowed`, filtered-out nodes are still traversed but never returned.
+        """
+        graph = self.layers[layer]
+        visited = set(entry_points)
+        entry_sims = self.vectors[entry_points] @ query
+        candidates = [(-float(s), e) for s, e in zip(entry_sims, entry_points)]
+        results = [(float(s), e) for s, e in zip(entry_sims, entry_points) if allowed is None or allowed[e]]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if len(results) >= ef and -neg_sim < results[0][0]:
+                break
+            neighbours = [n for n in graph.get(node, ()) if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            sims = self.vectors[neighbours] @ query
+            for sim, n in zip(sims.tolist(), neighbours):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, n))
+                    if allowed is None or allowed[n]:
+                        heapq.heappush(results, (sim, n))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select_neighbours(self, candidates: List[Tuple[float, int]], M: int) -> List[int]:
+        """Diversity heuristic: keep a candidate only if it is closer to the base than to any kept neighbour"""
+        selected: List[int] = []
+        for sim, c in candidates:
+            if len(selected) >= M:
+                break
+            if not selected or np.max(self.vectors[selected] @ self.vectors[c]) < sim:
+                selected.append(c)
+        return selected
+
+    def _connect(self, node: int, neighbours: List[int], layer: int) -> None:
+        graph = self.layers[layer]
+        max_links = self.M0 if layer == 0 else self.M
+        graph[node] = list(neighbours)
+        for n in neighbours:
+            links = graph.setdefault(n, [])
+            links.append(node)
+            if len(links) > max_links:
+                sims = self.vectors[links] @ self.vectors[n]
+                ranked = sorted(zip(sims.tolist(), links), reverse=True)
+                graph[n] = self._select_neighbours(ranked, max_links)
+
+    def _insert(self, node: int) -> None:
+        level = int(-np.log(1.0 - self.rng.random()) * self.level_mult)
+        query = self.vectors[node]
+
+        if self.entry_point is None:
+            self.layers.extend({} for _ in range(level + 1 - len(self.layers)))
+            for l in range(level + 1):
+                self.layers[l][node] = []
+            self.entry_point = node
+            return
+
+        top = len(self.layers) - 1
+        entry = [self.entry_point]
+        for l in range(top, level, -1):
+            entry = [self._search_layer(query, entry, 1, l)[0][1]]
+
+        for l in range(min(level, top), -1, -1):
+            candidates = self._search_layer(query, entry, self.ef_construction, l)
+            neighbours = self._select_neighbours(candidates, self.M)
+            self._connect(node, neighbours, l)
+            entry = [c for _, c in candidates]
+
+        if level > top:
+            for _ in range(level - top):
+                self.layers.append({node: []})
+            self.entry_point = node
+
+    def build(self, embeddings: np.ndarray) -> "HNSWIndex":
+        self.vectors = np.asarray(embeddings, dtype=np.float32)
+        self.layers = []
+        self.entry_point = None
+        for node in range(len(self.vectors)):
+            self._insert(node)
+        return self
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.entry_point is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ef = max(self.ef_search, k)
+        if allowed is not None:
+            # Filtered-out nodes are traversed but not returned: widen ef by the
+            # inverse selectivity, and scan the allowed rows directly once that
+            # costs no more than the traversal
+            allowed_rows = np.flatnonzero(allowed)
+            if allowed_rows.size == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            ef = int(min(len(self.vectors), np.ceil(ef * len(self.vectors) / allowed_rows.size)))
+            if allowed_rows.size <= ef:
+                return _top_k(allowed_rows, self.vectors[allowed_rows] @ query, k)
+
+        entry = [self.entry_point]
+        for l in range(len(self.layers) - 1, 0, -1):
+            entry = [self._search_layer(query, entry, 1, l)[0][1]]
+
+        results = self._search_layer(query, entry, ef, 0, allowed=allowed)[:k]
+        ids = np.array([n for _, n in results], dtype=np.int64)
+        sims = np.array([s for s, _ in results], dtype=np.float32)
+        return ids, sims
+
+    def params(self) -> dict:
+        return {"M": self.M, "ef_construction": self.ef_construction, "ef_search": self.ef_search}
+
+INDEX_TYPES = {
+    IVFFlatIndex.name: IVFFlatIndex,
+    HNSWIndex.name: HNSWIndex,
+}
+
+def build_index(kind: str, embeddings: np.ndarray, **params) -> ANNIndex:
+    """Build an ANN index of the given kind ("ivf" or "hnsw")"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {kind}")
+    logger.info(f"Building {kind} index over {len(embeddings)} vectors with {params}")
+    return INDEX_TYPES[kind](**params).build(embeddings)
@@ -0,0 +1,86 @@
+"""
+ANN Benchmark
+Measures recall@k and latency of the IVF and HNSW indexes against exact search.
+
+Usage:
+    python benchmark_ann.py --n 50000 --dim 512 --k 20
+    python benchmark_ann.py --index ivf --nprobe 1 4 8 16 32
+"""
+
+import argparse
+import time
+from typing import List
+import numpy as np
+
+from ann_index import build_index
+from catalog import normalize_rows, top_k_indices
+
+def make_dataset(n: int, dim: int, n_clusters: int, seed: int = 0) -> np.ndarray:
+    """Clustered synthetic embeddings (real image embeddings are far from uniform)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    data = centers[labels] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return normalize_rows(data)
+
+def exact_neighbours(data: np.ndarray, queries: np.ndarray, k: int) -> List[np.ndarray]:
+    return [top_k_indices(data @ q, k) for q in queries]
+
+def evaluate(index, queries: np.ndarray, truth: List[np.ndarray], k: int) -> dict:
+    hits = 0
+    start = time.perf_counter()
+    for q, expected in zip(queries, truth):
+        ids, _ = index.search(q, k)
+        hits += len(np.intersect1d(ids, expected))
+    elapsed = time.perf_counter() - start
+    return {
+        "recall": hits / (k * len(queries)),
+        "latency_ms": elapsed / len(queries) * 1000,
+        "qps": len(queries) / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs. exact search for ANN indexes")
+    parser.add_argument("--n", type=int, default=20000, help="catalog size")
+    parser.add_argument("--dim", type=int, default=512, help="embedding dimension")
+    parser.add_argument("--clusters", type=int, default=100, help="synthetic cluster count")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries")
+    parser.add_argument("--k", type=int, default=20, help="neighbours per query")
+    parser.add_argument("--index", choices=["ivf", "hnsw", "all"], default="all")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (default: sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--M", type=int, default=16, help="HNSW max links per node")
+    parser.add_argument("--ef-construction", type=int, default=100)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    args = parser.parse_args()
+
+    data = make_dataset(args.n, args.dim, args.clusters)
+    queries = make_dataset(args.queries, args.dim, args.clusters, seed=1)
+
+    start = time.perf_counter()
+    truth = exact_neighbours(data, queries, args.k)
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"Exact search: {exact_ms:.2f} ms/query over {args.n} x {args.dim}")
+    print(f"{'index':<6} {'param':<16} {'recall@' + str(args.k):<10} {'ms/query':<10} {'qps':<10}")
+
+    if args.index in ("ivf", "all"):
+        n_lists = args.nlist or int(np.sqrt(args.n))
+        start = time.perf_counter()
+        index = build_index("ivf", data, n_lists=n_lists)
+        print(f"# ivf build: {time.perf_counter() - start:.1f}s (n_lists={n_lists})")
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            r = evaluate(index, queries, truth, args.k)
+            print(f"{'ivf':<6} {'nprobe=' + str(nprobe):<16} {r['recall']:<10.3f} {r['latency_ms']:<10.2f} {r['qps']:<10.0f}")
+
+    if args.index in ("hnsw", "all"):
+        start = time.perf_counter()
+        index = build_index("hnsw", data, M=args.M, ef_construction=args.ef_construction)
+        print(f"# hnsw build: {time.perf_counter() - start:.1f}s (M={args.M})")
+        for ef_search in args.ef_search:
+            index.ef_search = ef_search
+            r = evaluate(index, queries, truth, args.k)
+            print(f"{'hnsw':<6} {'ef_search=' + str(ef_search):<16} {r['recall']:<10.3f} {r['latency_ms']:<10.2f} {r['qps']:<10.0f}")
+
+if __name__ == "__main__":
+    main()
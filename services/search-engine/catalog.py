@@ -0,0 +1,336 @@
+"""
+Product Catalog
+Columnar in-memory catalog with vectorized similarity scoring
+"""
+
+from typing import List, NamedTuple, Optional, Sequence
+import os
+import tempfile
+import numpy as np
+
+from ann_index import ANNIndex, build_index
+from filters import CodedColumn, ProductFilter
+from quantization import Quantizer, build_quantizer
+
+# Ranking weights:
+# score = α * cosine_similarity + β * price_alignment + γ * brand_score + δ * availability
+ALPHA = 0.6  # Similarity weight
+BETA = 0.2   # Price alignment weight
+GAMMA = 0.1  # Brand score weight
+DELTA = 0.1  # Availability weight
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of a matrix (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return indices of the k highest scores, sorted descending.
+    Uses argpartition so only the selected k are fully sorted.
+    """
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def calculate_product_scores(
+    similarities: np.ndarray,
+    prices: np.ndarray,
+    budget: Optional[float],
+    brand_score: float = 0.5,
+    availability: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Calculate final product scores for a batch of products using ranking formula:
+    score = α * cosine_similarity + β * price_alignment + γ * brand_score + δ * availability
+    """
+    # Price alignment (closer to budget = higher score)
+    if budget:
+        price_alignment = np.maximum(0.0, 1.0 - np.abs(prices - budget) / budget)
+    else:
+        price_alignment = 0.5
+
+    # Availability score
+    if availability is None:
+        availability_score = 1.0
+    else:
+        availability_score = availability.astype(np.float32)
+
+    scores = (
+        ALPHA * similarities +
+        BETA * price_alignment +
+        GAMMA * brand_score +
+        DELTA * availability_score
+    )
+
+    return np.asarray(scores, dtype=np.float32)
+
+class SearchResult(NamedTuple):
+    ids: np.ndarray           # catalog rows, best first
+    similarities: np.ndarray  # cosine similarity per row
+    scores: np.ndarray        # ranking score per row
+    total_matches: int        # rows above min_similarity
+
+def empty_result() -> SearchResult:
+    return SearchResult(
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.float32),
+        np.empty(0, dtype=np.float32),
+        0
+    )
+
+# Filtered candidate sets up to this size are scored exactly instead of through the ANN index
+FILTER_EXACT_MAX_ROWS = 20000
+
+class ProductCatalog:
+    """
+    Product catalog held as parallel arrays:
+    - embeddings: (N, D) float32 matrix, rows L2-normalized at build time
+    - prices: (N,) float32
+    - availability: (N,) bool
+    - products: per-row metadata dicts (without embeddings)
+    - categories / brands: dictionary-encoded columns with inverted indexes
+    - deleted: (N,) bool tombstones, deleted rows are never returned
+
+    In compressed mode the embeddings are replaced by quantizer codes and
+    the float matrix is only used to re-rank the best candidates exactly.
+    """
+
+    def __init__(
+        self,
+        products: Sequence[dict],
+        embeddings: np.ndarray,
+        prices: Optional[np.ndarray] = None,
+        availability: Optional[np.ndarray] = None,
+        categories: Optional[CodedColumn] = None,
+        brands: Optional[CodedColumn] = None,
+        normalized: bool = False
+    ):
+        if len(products) != len(embeddings):
+            raise ValueError("products and embeddings must have the same length")
+        self.products = products
+        # Pre-normalized (e.g. memory-mapped) matrices are used as-is, without a copy
+        self.embeddings = embeddings if normalized else normalize_rows(embeddings)
+        if prices is None:
+            prices = np.array([p["price"] for p in products], dtype=np.float32)
+        if availability is None:
+            availability = np.array([p.get("availability", True) for p in products], dtype=bool)
+        self.prices = prices
+        self.availability = availability
+        self.categories = categories or CodedColumn.from_values(p.get("category") for p in products)
+        self.brands = brands or CodedColumn.from_values(p.get("brand") for p in products)
+        self.deleted = np.zeros(len(products), dtype=bool)
+        self.index: Optional[ANNIndex] = None
+        self.quantizer: Optional[Quantizer] = None
+        self.codes: Optional[np.ndarray] = None
+        self._dim = self.embeddings.shape[1]
+
+    @classmethod
+    def from_records(cls, records: List[dict]) -> "ProductCatalog":
+        """Build catalog from product dicts carrying an "embedding" field"""
+        products = [{k: v for k, v in r.items() if k != "embedding"} for r in records]
+        if records:
+            embeddings = np.stack([np.asarray(r["embedding"], dtype=np.float32) for r in records])
+        else:
+            embeddings = np.empty((0, 0), dtype=np.float32)
+        return cls(products, embeddings)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def product(self, row: int) -> dict:
+        """Metadata for a row with its current price and availability"""
+        return {
+            **self.products[row],
+            "price": float(self.prices[row]),
+            "availability": bool(self.availability[row]),
+        }
+
+    def ensure_writable(self) -> None:
+        """Copy memory-mapped price/availability columns to RAM before patching them"""
+        if not self.prices.flags.writeable:
+            self.prices = np.array(self.prices)
+        if not self.availability.flags.writeable:
+            self.availability = np.array(self.availability)
+
+    def build_index(self, kind: str, **params) -> ANNIndex:
+        """Build an approximate nearest-neighbour index over the embeddings"""
+        self.index = build_index(kind, self.embeddings, **params)
+        return self.index
+
+    def compress(self, kind: str, rerank_dir: Optional[str] = None, **params) -> Quantizer:
+        """
+        Replace the resident float matrix with quantized codes ("int8" or "pq").
+        With rerank_dir the float matrix is spilled to an .npy file there and
+        memory-mapped read-only for re-ranking; otherwise it is dropped.
+        """
+        self.quantizer = build_quantizer(kind, self.embeddings, **params)
+        self.codes = self.quantizer.encode(self.embeddings)
+        if isinstance(self.embeddings, np.memmap):
+            pass  # Already on disk
+        elif rerank_dir:
+            fd, path = tempfile.mkstemp(suffix=".npy", dir=rerank_dir)
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, self.embeddings)
+            self.embeddings = np.load(path, mmap_mode="r")
+            # The mapping outlives the directory entry, the file is freed with the catalog
+            os.unlink(path)
+        else:
+            self.embeddings = None
+        return self.quantizer
+
+    def memory_usage(self) -> dict:
+        """Resident bytes held by the vector storage"""
+        usage = {
+            "storage": self.quantizer.name if self.quantizer else "float32",
+            "vector_bytes": 0,
+        }
+        if self.codes is not None:
+            usage["vector_bytes"] = int(self.codes.nbytes)
+        elif isinstance(self.embeddings, np.ndarray) and not isinstance(self.embeddings, np.memmap):
+            usage["vector_bytes"] = int(self.embeddings.nbytes)
+        usage["float32_bytes"] = len(self) * self.dim * 4
+        return usage
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity between query and every catalog row (approximate in compressed mode)"""
+        query = normalize_rows(query)
+        if self.quantizer is not None:
+            return self.quantizer.scores(self.codes, query)
+        return self.embeddings @ query
+
+    def rerank(self, ids: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Exact float similarities for a candidate subset"""
+        # Read rows in storage order, friendlier to memory-mapped files
+        order = np.argsort(ids)
+        sims = np.empty(len(ids), dtype=np.float32)
+        sims[order] = np.asarray(self.embeddings[ids[order]], dtype=np.float32) @ normalize_rows(query)
+        return sims
+
+    def rank(
+        self,
+        ids: np.ndarray,
+        similarities: np.ndarray,
+        max_results: int,
+        min_similarity: float,
+        budget: Optional[float] = None
+    ) -> SearchResult:
+        """Score candidate rows and select the top results"""
+        mask = (similarities >= min_similarity) & ~self.deleted[ids]
+        ids = ids[mask]
+        similarities = similarities[mask]
+
+        scores = calculate_product_scores(
+            similarities,
+            self.prices[ids],
+            budget,
+            brand_score=0.5,
+            availability=self.availability[ids]
+        )
+
+        top = top_k_indices(scores, max_results)
+        return SearchResult(ids[top], similarities[top], scores[top], int(ids.size))
+
+    def filter_rows(self, filters: Optional[ProductFilter]) -> Optional[np.ndarray]:
+        """Rows passing the filters, or None when nothing is filtered"""
+        if filters is None or filters.is_empty():
+            return None
+        return filters.matching_rows(self.categories, self.brands, self.prices, self.availability)
+
+    def search(
+        self,
+        query: np.ndarray,
+        max_results: int,
+        min_similarity: float,
+        budget: Optional[float] = None,
+        use_index: bool = True,
+        candidate_pool: int = 200,
+        filters: Optional[ProductFilter] = None
+    ) -> SearchResult:
+        """
+        Search the catalog.
+        Filters are resolved to candidate rows before any vector scoring.
+        With an ANN index or compressed storage, only the `candidate_pool`
+        nearest rows are scored, so total matches is counted within that pool.
+        """
+        if len(self) == 0:
+            return empty_result()
+
+        rows = self.filter_rows(filters)
+        if rows is not None and rows.size == 0:
+            return empty_result()
+
+        query = normalize_rows(query)
+        pool = max(candidate_pool, max_results)
+        if use_index and self.index is not None and (rows is None or rows.size > FILTER_EXACT_MAX_ROWS):
+            allowed = None
+            if rows is not None:
+                allowed = np.zeros(len(self), dtype=bool)
+                allowed[rows] = True
+            ids, similarities = self.index.search(query, pool, allowed=allowed)
+        elif self.quantizer is not None:
+            # Approximate scan over codes, then exact re-rank of the best candidates
+            codes = self.codes if rows is None else self.codes[rows]
+            approx = self.quantizer.scores(codes, query)
+            top = top_k_indices(approx, pool)
+            ids = top if rows is None else rows[top]
+            if self.embeddings is not None:
+                similarities = self.rerank(ids, query)
+            else:
+                similarities = approx[top]
+        elif rows is None:
+            similarities = self.embeddings @ query
+            ids = np.arange(len(self))
+        else:
+            similarities = np.asarray(self.embeddings[rows], dtype=np.float32) @ query
+            ids = rows
+        return self.rank(ids, similarities, max_results, min_similarity, budget)
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        max_results: int,
+        min_similarity: float,
+        budget: Optional[float] = None,
+        use_index: bool = True,
+        candidate_pool: int = 200,
+        filters: Optional[ProductFilter] = None
+    ) -> List[SearchResult]:
+        """
+        Search several queries at once.
+        On the exact float path all queries are scored with one matrix-matrix
+        product; ANN and compressed storage fall back to per-query search.
+        """
+        queries = np.atleast_2d(queries)
+        if (use_index and self.index is not None) or self.quantizer is not None:
+            return [
+                self.search(q, max_results, min_similarity, budget, use_index, candidate_pool, filters)
+                for q in queries
+            ]
+        if len(self) == 0:
+            return [empty_result() for _ in queries]
+
+        rows = self.filter_rows(filters)
+        if rows is None:
+            ids, embeddings = np.arange(len(self)), self.embeddings
+        elif rows.size == 0:
+            return [empty_result() for _ in queries]
+        else:
+            ids, embeddings = rows, np.asarray(self.embeddings[rows], dtype=np.float32)
+
+        # (Q, N): one row of similarities per query
+        similarities = normalize_rows(queries) @ embeddings.T
+        return [
+            self.rank(ids, sims, max_results, min_similarity, budget)
+            for sims in similarities
+        ]
@@ -0,0 +1,202 @@
+"""
+On-disk Catalog Store
+Binary catalog format that workers memory-map read-only, so every uvicorn
+worker shares one page-cache copy and startup does not depend on catalog size.
+
+Layout of a catalog directory:
+    manifest.json           format version, row count, embedding dim
+    embeddings.npy          (N, D) float32, rows L2-normalized
+    prices.npy              (N,) float32
+    availability.npy        (N,) bool
+    category_codes.npy      (N,) int32 codes into columns.json["category"]
+    brand_codes.npy         (N,) int32 codes into columns.json["brand"]
+    columns.json            dictionary values of the coded columns
+    metadata.jsonl          one JSON object per row (id, name, category, ...)
+    metadata_offsets.npy    (N + 1,) uint64 byte offsets into metadata.jsonl
+
+Build from ProductCreate records (JSONL, one product per line):
+    python catalog_store.py build products.jsonl ./catalog
+"""
+
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+import argparse
+import json
+import logging
+import mmap
+import time
+import numpy as np
+
+from catalog import ProductCatalog, normalize_rows
+from filters import CodedColumn, normalize_value
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+
+# Fields kept in the metadata sidecar (embeddings live in embeddings.npy)
+METADATA_FIELDS = ["id", "name", "category", "price", "image", "url", "brand", "rating", "availability"]
+
+class MetadataSidecar:
+    """
+    Read-only row access to metadata.jsonl through a memory map.
+    Rows are decoded on demand, so only returned results pay JSON parsing.
+    """
+
+    def __init__(self, path: Path):
+        self._offsets = np.load(path / "metadata_offsets.npy", mmap_mode="r")
+        self._data = b""
+        meta_path = path / "metadata.jsonl"
+        if meta_path.stat().st_size:
+            with open(meta_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> dict:
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._data[start:end])
+
+    def __iter__(self) -> Iterator[dict]:
+        for row in range(len(self)):
+            yield self[row]
+
+def load_catalog(path: str) -> ProductCatalog:
+    """Open a catalog directory; arrays are memory-mapped, nothing is copied"""
+    path = Path(path)
+    manifest = json.loads((path / "manifest.json").read_text())
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalog format version: {manifest.get('version')}")
+
+    embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+    columns = json.loads((path / "columns.json").read_text())
+    catalog = ProductCatalog(
+        MetadataSidecar(path),
+        embeddings,
+        prices=np.load(path / "prices.npy", mmap_mode="r"),
+        availability=np.load(path / "availability.npy", mmap_mode="r"),
+        categories=CodedColumn(np.load(path / "category_codes.npy", mmap_mode="r"), columns["category"]),
+        brands=CodedColumn(np.load(path / "brand_codes.npy", mmap_mode="r"), columns["brand"]),
+        normalized=True
+    )
+    logger.info(f"Mapped catalog {path}: {manifest['count']} products, dim {manifest['dim']}")
+    return catalog
+
+def write_catalog(records: Iterable[dict], path: str, chunk_size: int = 8192) -> int:
+    """
+    Stream product dicts (with an "embedding" field) into a catalog directory.
+    Memory use is bounded by chunk_size rows. Returns the number of rows written.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    raw_path = path / "embeddings.f32"
+
+    count = 0
+    dim: Optional[int] = None
+    prices, availability, offsets = [], [], [0]
+    columns = {"category": {}, "brand": {}}
+    column_codes = {"category": [], "brand": []}
+    batch = []
+
+    def flush(raw_file):
+        if batch:
+            raw_file.write(normalize_rows(np.stack(batch)).tobytes())
+            batch.clear()
+
+    with open(raw_path, "wb") as raw_file, open(path / "metadata.jsonl", "wb") as meta_file:
+        for record in records:
+            embedding = np.asarray(record["embedding"], dtype=np.float32)
+            if dim is None:
+                dim = embedding.shape[0]
+            elif embedding.shape[0] != dim:
+                raise ValueError(f"Record {count} has embedding dim {embedding.shape[0]}, expected {dim}")
+
+            batch.append(embedding)
+            if len(batch) >= chunk_size:
+                flush(raw_file)
+
+            metadata = {field: record.get(field) for field in METADATA_FIELDS}
+            meta_file.write(json.dumps(metadata, ensure_ascii=False).encode("utf-8") + b"\n")
+            offsets.append(meta_file.tell())
+            prices.append(record["price"])
+            availability.append(record.get("availability", True))
+            for name, lookup in columns.items():
+                column_codes[name].append(lookup.setdefault(normalize_value(record.get(name)), len(lookup)))
+            count += 1
+        flush(raw_file)
+
+    # Wrap the raw rows in an .npy header, copying in chunks
+    dim = dim or 0
+    embeddings = np.lib.format.open_memmap(path / "embeddings.npy", mode="w+", dtype=np.float32, shape=(count, dim))
+    if count and dim:
+        raw = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(count, dim))
+        for start in range(0, count, chunk_size):
+            embeddings[start:start + chunk_size] = raw[start:start + chunk_size]
+        del raw
+    embeddings.flush()
+    del embeddings
+    raw_path.unlink()
+
+    np.save(path / "prices.npy", np.array(prices, dtype=np.float32))
+    np.save(path / "availability.npy", np.array(availability, dtype=bool))
+    np.save(path / "metadata_offsets.npy", np.array(offsets, dtype=np.uint64))
+    np.save(path / "category_codes.npy", np.array(column_codes["category"], dtype=np.int32))
+    np.save(path / "brand_codes.npy", np.array(column_codes["brand"], dtype=np.int32))
+    (path / "columns.json").write_text(json.dumps(
+        {name: list(lookup) for name, lookup in columns.items()}, ensure_ascii=False
+    ))
+    (path / "manifest.json").write_text(json.dumps({
+        "version": FORMAT_VERSION,
+        "count": count,
+        "dim": dim,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }, indent=2))
+    return count
+
+def read_product_records(input_path: str) -> Iterator[dict]:
+    """Validate JSONL lines as ProductCreate and yield catalog records"""
+    import _paths  # puts shared/ on the import path in a source checkout
+    from shared.schemas.product import ProductCreate
+
+    skipped = 0
+    with open(input_path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            product = ProductCreate(**raw)
+            if product.embedding is None:
+                skipped += 1
+                continue
+            yield {"id": str(raw.get("id", line_no)), **product.model_dump()}
+    if skipped:
+        logger.warning(f"Skipped {skipped} products without an embedding")
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Search-engine catalog store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build a catalog directory from ProductCreate JSONL")
+    build.add_argument("input", help="JSONL file with one ProductCreate per line (optional \"id\" field)")
+    build.add_argument("output", help="Output catalog directory")
+    build.add_argument("--chunk-size", type=int, default=8192)
+
+    info = subparsers.add_parser("info", help="Print a catalog manifest")
+    info.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        start = time.perf_counter()
+        count = write_catalog(read_product_records(args.input), args.output, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Wrote {count} products to {args.output} in {elapsed:.1f}s")
+    else:
+        print((Path(args.path) / "manifest.json").read_text())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Embedding Cache
+Bounded LRU + TTL cache for query embeddings, with an optional SQLite tier
+that several workers (or replicas on one host) can share.
+
+Entries are keyed by image URL, as a fast path in front of the shared
+design-analysis store (which deduplicates by content hash). Timestamps are
+wall-clock in both tiers, so an entry promoted from disk keeps its age.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def url_key(image_url: str) -> str:
+    return f"url:{image_url}"
+
+class DiskTier:
+    """SQLite-backed second tier, safe to share between processes"""
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, float]]:
+        """Return (embedding, created_at) for a live entry"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32), row[1]
+
+    def put(self, key: str, embedding: np.ndarray, created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, np.asarray(embedding, dtype=np.float32).tobytes(), created_at)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+class EmbeddingCache:
+    """
+    In-memory LRU with TTL, backed by an optional disk tier.
+    The sync get/put block on SQLite when the disk tier is enabled; async
+    callers use get_async/put_async, which only leave the loop for disk I/O.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600.0, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskTier(disk_path, ttl) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get_memory(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            embedding, created_at = entry
+            if time.time() - created_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return embedding
+
+    def _put_memory(self, key: str, embedding: np.ndarray, created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (embedding, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _promote(self, key: str, entry: Optional[Tuple[np.ndarray, float]]) -> Optional[np.ndarray]:
+        """Count a disk lookup and copy a hit into memory with its original age"""
+        if entry is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        embedding, created_at = entry
+        self._put_memory(key, embedding, created_at)
+        return embedding
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up memory, then disk; counts one hit or miss per call"""
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            self.hits += 1
+            return embedding
+        if self.disk is None:
+            self.misses += 1
+            return None
+        return self._promote(key, self.disk.get(key))
+
+    async def get_async(self, key: str) -> Optional[np.ndarray]:
+        """As get, with the disk lookup run in a worker thread"""
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            self.hits += 1
+            return embedding
+        if self.disk is None:
+            self.misses += 1
+            return None
+        return self._promote(key, await asyncio.to_thread(self.disk.get, key))
+
+    def _prepare(self, key: str, embedding: np.ndarray) -> Tuple[np.ndarray, float]:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        created_at = time.time()
+        self._put_memory(key, embedding, created_at)
+        return embedding, created_at
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        embedding, created_at = self._prepare(key, embedding)
+        if self.disk is not None:
+            self.disk.put(key, embedding, created_at)
+
+    async def put_async(self, key: str, embedding: np.ndarray) -> None:
+        """As put, with the disk write run in a worker thread"""
+        embedding, created_at = self._prepare(key, embedding)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, embedding, created_at)
+
+    def purge_expired(self) -> int:
+        """Drop expired rows from the disk tier; memory entries expire on lookup"""
+        return self.disk.purge_expired() if self.disk is not None else 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_tier": self.disk is not None,
+        }
@@ -0,0 +1,135 @@
+"""
+Encoder Micro-batching
+Collects concurrent encode requests for up to `max_wait_ms` or `max_batch`
+items and runs them as one batched forward pass in a worker thread, so the
+event loop never blocks on the encoder and the model sees batches > 1.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Set, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class BatchingEncoder:
+    """
+    Async front-end that batches calls to `encode_batch(items)`, which returns
+    one result per item (e.g. a (B, D) array, or (embedding, features) pairs)
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[Any]], Sequence],
+        max_batch: int = 16,
+        max_wait_ms: float = 5.0,
+        workers: int = 1
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encoder")
+        # Bounds batches in flight to the number of worker threads
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional["asyncio.Queue[Tuple[Any, asyncio.Future, float]]"] = None
+        self._task: Optional[asyncio.Task] = None
+        # Strong references to running batches: the loop only keeps weak ones
+        self._inflight: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.total_encode_time = 0.0
+
+    def _ensure_started(self) -> None:
+        # Started lazily so the queue binds to the running event loop
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def encode(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self) -> None:
+        batch: List[Tuple[Any, asyncio.Future, float]] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = time.perf_counter() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._slots.acquire()
+                task = asyncio.get_running_loop().create_task(self._execute(batch))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # Stopped by close(): release callers of the batch being collected
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+
+    async def _execute(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        try:
+            started = time.perf_counter()
+            self.total_wait += sum(started - queued_at for _, _, queued_at in batch)
+            try:
+                embeddings = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self.encode_batch, [item for item, _, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Batch encode failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.total_encode_time += time.perf_counter() - started
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        """Stop batching, let running batches finish and cancel queued items"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "workers": self.workers,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "avg_queue_wait_ms": self.total_wait / self.items * 1000 if self.items else 0.0,
+            "avg_batch_encode_ms": self.total_encode_time / self.batches * 1000 if self.batches else 0.0,
+        }
@@ -0,0 +1,108 @@
+"""
+Catalog Filters
+Structured pre-filters (category, brand, price band, availability) evaluated
+on columnar indexes before vector scoring.
+"""
+
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+def normalize_value(value: Optional[str]) -> Optional[str]:
+    return value.strip().lower() if isinstance(value, str) else None
+
+class CodedColumn:
+    """
+    Dictionary-encoded string column with an inverted index.
+    codes[row] is an index into values; postings are built on first use
+    as a CSR layout (rows sorted by code), so loading stays O(1).
+    """
+
+    def __init__(self, codes: np.ndarray, values: List[Optional[str]]):
+        self.codes = codes
+        self.values = values
+        self.lookup: Dict[Optional[str], int] = {v: i for i, v in enumerate(values)}
+        self._rows: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_values(cls, values: Iterable[Optional[str]]) -> "CodedColumn":
+        lookup: Dict[Optional[str], int] = {}
+        codes = [lookup.setdefault(normalize_value(v), len(lookup)) for v in values]
+        return cls(np.array(codes, dtype=np.int32), list(lookup))
+
+    def _build_postings(self) -> None:
+        self._rows = np.argsort(self.codes, kind="stable")
+        counts = np.bincount(self.codes, minlength=len(self.values))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def rows(self, wanted: Iterable[str]) -> np.ndarray:
+        """Sorted row ids whose value is any of `wanted` (case-insensitive)"""
+        if self._rows is None:
+            self._build_postings()
+        # Duplicate or case-variant values share a code; each code's rows are taken once
+        codes = [self.lookup.get(normalize_value(value)) for value in wanted]
+        codes = np.unique([code for code in codes if code is not None]).astype(np.int64)
+        parts = [self._rows[self._offsets[code]:self._offsets[code + 1]] for code in codes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+class ProductFilter:
+    """Structured search filter; empty fields do not restrict"""
+
+    def __init__(
+        self,
+        categories: Optional[List[str]] = None,
+        brands: Optional[List[str]] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+        in_stock_only: bool = False
+    ):
+        self.categories = categories or None
+        self.brands = brands or None
+        self.price_min = price_min
+        self.price_max = price_max
+        self.in_stock_only = in_stock_only
+
+    def is_empty(self) -> bool:
+        return (
+            self.categories is None and
+            self.brands is None and
+            self.price_min is None and
+            self.price_max is None and
+            not self.in_stock_only
+        )
+
+    def matching_rows(
+        self,
+        categories: CodedColumn,
+        brands: CodedColumn,
+        prices: np.ndarray,
+        availability: np.ndarray
+    ) -> np.ndarray:
+        """
+        Row ids passing the filter. Inverted lists narrow the candidate set
+        first; price and availability are then checked on those rows only.
+        """
+        rows: Optional[np.ndarray] = None
+        if self.categories is not None:
+            rows = categories.rows(self.categories)
+        if self.brands is not None:
+            brand_rows = brands.rows(self.brands)
+            rows = brand_rows if rows is None else np.intersect1d(rows, brand_rows, assume_unique=True)
+
+        if rows is None:
+            mask = np.ones(len(prices), dtype=bool)
+            row_prices, row_availability = prices, availability
+        else:
+            mask = np.ones(len(rows), dtype=bool)
+            row_prices, row_availability = prices[rows], availability[rows]
+
+        if self.price_min is not None:
+            mask &= row_prices >= self.price_min
+        if self.price_max is not None:
+            mask &= row_prices <= self.price_max
+        if self.in_stock_only:
+            mask &= row_availability
+
+        return np.flatnonzero(mask) if rows is None else rows[mask]
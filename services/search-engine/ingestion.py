@@ -0,0 +1,381 @@
+"""
+Catalog Ingestion
+Incremental updates on top of an immutable main catalog.
+
+- Upserts are appended to a small in-memory delta segment searched alongside the main one
+- Deletes and superseded main rows are tombstoned
+- Price / availability updates patch the columns in place (visible immediately)
+- When the delta grows past a threshold, a background thread merges it into a
+  new main catalog and swaps it in atomically
+
+Queries never take the writer lock: they read one immutable segments
+reference and search it, so ingestion and merges never block search.
+
+The delta, tombstones and merged generations live in the memory of the
+process that received the writes: ingestion requires the search engine to
+run as a single worker process (other workers would not see the changes).
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import threading
+import time
+import numpy as np
+
+from catalog import ProductCatalog, SearchResult, normalize_rows, top_k_indices
+from filters import CodedColumn, ProductFilter, normalize_value
+
+logger = logging.getLogger(__name__)
+
+class Segments:
+    """Immutable view: main catalog + delta segment + product id lookup"""
+
+    def __init__(
+        self,
+        main: ProductCatalog,
+        delta: ProductCatalog,
+        main_rows: Dict[str, int],
+        generation: int
+    ):
+        self.main = main
+        self.delta = delta
+        self.main_rows = main_rows
+        self.generation = generation
+
+class DeltaSegment:
+    """
+    Append-only storage behind the delta catalog. Rows are written into
+    preallocated columns (capacity doubles when full), so an upsert costs
+    O(batch) instead of a rebuild; replaced and deleted rows are tombstoned.
+    Searches read a ProductCatalog view over the rows written so far.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.size = 0
+        self.products: List[dict] = []
+        self.rows: Dict[str, int] = {}  # product id -> live row
+        self.embeddings = np.empty((capacity, dim), dtype=np.float32)
+        self.prices = np.empty(capacity, dtype=np.float32)
+        self.availability = np.empty(capacity, dtype=bool)
+        self.deleted = np.zeros(capacity, dtype=bool)
+        self.category_codes = np.empty(capacity, dtype=np.int32)
+        self.brand_codes = np.empty(capacity, dtype=np.int32)
+        self.categories: Dict[Optional[str], int] = {}
+        self.brands: Dict[Optional[str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow(self, capacity: int) -> None:
+        # Fresh arrays: views already handed to searches keep the old ones
+        for name in ("embeddings", "prices", "availability", "deleted", "category_codes", "brand_codes"):
+            column = getattr(self, name)
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, records: List[dict]) -> List[int]:
+        """Write records as new rows, returns the rows they replace (not yet tombstoned)"""
+        start, end = self.size, self.size + len(records)
+        if end > len(self.prices):
+            self._grow(max(end, 2 * len(self.prices)))
+        if records:
+            self.embeddings[start:end] = normalize_rows(
+                np.stack([np.asarray(r["embedding"], dtype=np.float32) for r in records])
+            )
+        replaced = []
+        for row, r in enumerate(records, start):
+            product = {k: v for k, v in r.items() if k != "embedding"}
+            self.products.append(product)
+            self.prices[row] = product["price"]
+            self.availability[row] = product.get("availability", True)
+            self.category_codes[row] = self.categories.setdefault(
+                normalize_value(product.get("category")), len(self.categories)
+            )
+            self.brand_codes[row] = self.brands.setdefault(normalize_value(product.get("brand")), len(self.brands))
+            previous = self.rows.get(str(r["id"]))
+            if previous is not None:
+                replaced.append(previous)
+            self.rows[str(r["id"])] = row
+        self.size = end
+        return replaced
+
+    def delete(self, product_id: str) -> bool:
+        row = self.rows.pop(product_id, None)
+        if row is None:
+            return False
+        self.deleted[row] = True
+        return True
+
+    def view(self) -> ProductCatalog:
+        """Catalog over the rows written so far, sharing the columns (no copy)"""
+        n = self.size
+        catalog = ProductCatalog(
+            self.products[:n],
+            self.embeddings[:n],
+            self.prices[:n],
+            self.availability[:n],
+            categories=CodedColumn(self.category_codes[:n], list(self.categories)),
+            brands=CodedColumn(self.brand_codes[:n], list(self.brands)),
+            normalized=True
+        )
+        catalog.deleted = self.deleted[:n]
+        return catalog
+
+class LiveCatalog:
+    """Searchable catalog that accepts upserts, deletes and price/availability updates"""
+
+    def __init__(
+        self,
+        main: ProductCatalog,
+        merge_threshold: int = 10000,
+        prepare: Optional[Callable[[ProductCatalog], ProductCatalog]] = None
+    ):
+        self.merge_threshold = merge_threshold
+        # Applies the configured ANN index / compression to a freshly merged catalog
+        self.prepare = prepare or (lambda catalog: catalog)
+        self._lock = threading.Lock()
+        self._delta = DeltaSegment(main.dim)
+        self._segments = Segments(main, self._delta.view(), {}, generation=0)
+        self._main_rows_ready = False
+        self._merge_thread: Optional[threading.Thread] = None
+        # Operations applied while a merge is running, replayed onto the merged catalog
+        self._merge_log: Optional[List[Tuple[str, object]]] = None
+        self.last_merge: Optional[dict] = None
+
+    @property
+    def segments(self) -> Segments:
+        return self._segments
+
+    def __len__(self) -> int:
+        segments = self._segments
+        return int(len(segments.main) - segments.main.deleted.sum() + len(self._delta))
+
+    # Search
+
+    def search(
+        self,
+        query: np.ndarray,
+        max_results: int,
+        min_similarity: float,
+        budget: Optional[float] = None,
+        candidate_pool: int = 200,
+        filters: Optional[ProductFilter] = None
+    ) -> Tuple[List[dict], int]:
+        """Search main and delta segments, return (product dicts with similarity and score, total matches)"""
+        return self.search_batch(query[None, :], max_results, min_similarity, budget, candidate_pool, filters)[0]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        max_results: int,
+        min_similarity: float,
+        budget: Optional[float] = None,
+        candidate_pool: int = 200,
+        filters: Optional[ProductFilter] = None
+    ) -> List[Tuple[List[dict], int]]:
+        """Search several queries against both segments, one (products, total matches) per query"""
+        segments = self._segments
+        main_results = segments.main.search_batch(
+            queries, max_results, min_similarity, budget, candidate_pool=candidate_pool, filters=filters
+        )
+        if len(segments.delta):
+            delta_results = segments.delta.search_batch(queries, max_results, min_similarity, budget, filters=filters)
+        else:
+            delta_results = [None] * len(main_results)
+
+        batch = []
+        for main_result, delta_result in zip(main_results, delta_results):
+            hits: List[Tuple[ProductCatalog, SearchResult]] = [(segments.main, main_result)]
+            if delta_result is not None:
+                hits.append((segments.delta, delta_result))
+            batch.append(self._merge_hits(hits, max_results))
+        return batch
+
+    @staticmethod
+    def _merge_hits(hits: List[Tuple[ProductCatalog, SearchResult]], max_results: int) -> Tuple[List[dict], int]:
+        scores = np.concatenate([result.scores for _, result in hits])
+        owners = [
+            (catalog, row, sim, score)
+            for catalog, result in hits
+            for row, sim, score in zip(result.ids, result.similarities, result.scores)
+        ]
+        products = []
+        for i in top_k_indices(scores, max_results):
+            catalog, row, similarity, score = owners[i]
+            products.append({**catalog.product(row), "similarity": float(similarity), "score": float(score)})
+        return products, sum(result.total_matches for _, result in hits)
+
+    # Ingestion
+
+    def _ensure_main_rows(self) -> None:
+        """Build the product id -> main row lookup on first use (keeps startup O(1))"""
+        if self._main_rows_ready:
+            return
+        main = self._segments.main
+        self._segments.main_rows.update({str(main.products[row]["id"]): row for row in range(len(main))})
+        self._main_rows_ready = True
+
+    def upsert(self, records: Iterable[dict]) -> int:
+        """Insert or replace products; records carry "id" and "embedding" fields"""
+        records = list(records)
+        for r in records:
+            if r.get("embedding") is None:
+                raise ValueError(f"Product {r['id']} has no embedding")
+        with self._lock:
+            dim = self._delta.dim
+            if dim == 0 and records:
+                # Empty catalog: the first upsert sets the embedding dimension
+                dim = len(records[0]["embedding"])
+            for r in records:
+                if len(r["embedding"]) != dim:
+                    raise ValueError(f"Product {r['id']} has embedding dim {len(r['embedding'])}, expected {dim}")
+            if dim != self._delta.dim:
+                self._delta = DeltaSegment(dim)
+            self._ensure_main_rows()
+            self._apply("upsert", records)
+            if self._merge_log is not None:
+                self._merge_log.append(("upsert", records))
+        self.maybe_merge()
+        return len(records)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Delete products by id, returns how many existed"""
+        ids = list(ids)
+        with self._lock:
+            self._ensure_main_rows()
+            found = self._apply("delete", ids)
+            if self._merge_log is not None:
+                self._merge_log.append(("delete", ids))
+        return found
+
+    def update(self, updates: Iterable[dict]) -> int:
+        """Patch price and/or availability in place; updates carry "id" plus the changed fields"""
+        updates = list(updates)
+        with self._lock:
+            self._ensure_main_rows()
+            found = self._apply("update", updates)
+            if self._merge_log is not None:
+                self._merge_log.append(("update", updates))
+        return found
+
+    def _apply(self, op: str, payload) -> int:
+        """Apply one operation to the current segments (caller holds the lock)"""
+        segments = self._segments
+        if op == "upsert":
+            replaced = self._delta.append(payload)
+            # Publish the new rows before tombstoning the ones they replace, so a product never disappears
+            self._segments = Segments(segments.main, self._delta.view(), segments.main_rows, segments.generation)
+            self._delta.deleted[replaced] = True
+            for r in payload:
+                row = segments.main_rows.get(str(r["id"]))
+                if row is not None:
+                    segments.main.deleted[row] = True
+            return len(payload)
+
+        if op == "delete":
+            found = 0
+            for product_id in payload:
+                row = segments.main_rows.get(product_id)
+                if row is not None and not segments.main.deleted[row]:
+                    segments.main.deleted[row] = True
+                    found += 1
+                if self._delta.delete(product_id):
+                    found += 1
+            return found
+
+        if op == "update":
+            found = 0
+            segments.main.ensure_writable()
+            for update in payload:
+                product_id = str(update["id"])
+                if product_id in self._delta.rows:
+                    columns, row = self._delta, self._delta.rows[product_id]
+                elif product_id in segments.main_rows and not segments.main.deleted[segments.main_rows[product_id]]:
+                    columns, row = segments.main, segments.main_rows[product_id]
+                else:
+                    continue
+                if update.get("price") is not None:
+                    columns.prices[row] = update["price"]
+                if update.get("availability") is not None:
+                    columns.availability[row] = update["availability"]
+                found += 1
+            return found
+
+        raise ValueError(f"Unknown operation: {op}")
+
+    # Merge
+
+    @property
+    def merging(self) -> bool:
+        return self._merge_thread is not None and self._merge_thread.is_alive()
+
+    def maybe_merge(self, force: bool = False) -> bool:
+        """Start a background merge if the delta is large enough; returns whether one started"""
+        with self._lock:
+            if self.merging:
+                return False
+            if not force and self._delta.size < self.merge_threshold:
+                return False
+            self._merge_log = []
+            self._merge_thread = threading.Thread(
+                target=self._merge, args=(self._segments,), name="catalog-merge", daemon=True
+            )
+            self._merge_thread.start()
+        return True
+
+    def _merge(self, segments: Segments) -> None:
+        start = time.perf_counter()
+        try:
+            merged = self._build_merged(segments)
+        except Exception as e:
+            logger.error(f"Catalog merge failed: {e}")
+            with self._lock:
+                self._merge_log = None
+            return
+
+        with self._lock:
+            # Swap in the merged catalog, then replay what happened during the build
+            # (all operations are idempotent, so a replayed change is harmless)
+            main_rows = {str(merged.products[row]["id"]): row for row in range(len(merged))}
+            self._delta = DeltaSegment(merged.dim)
+            self._segments = Segments(merged, self._delta.view(), main_rows, segments.generation + 1)
+            self._main_rows_ready = True
+            log, self._merge_log = self._merge_log, None
+            for op, payload in log:
+                self._apply(op, payload)
+
+        self.last_merge = {
+            "generation": segments.generation + 1,
+            "products": len(merged),
+            "replayed_operations": len(log),
+            "duration": time.perf_counter() - start,
+        }
+        logger.info(f"Merged catalog: {self.last_merge}")
+
+    def _build_merged(self, segments: Segments) -> ProductCatalog:
+        main, delta = segments.main, segments.delta
+        if main.embeddings is None:
+            raise ValueError("main catalog has no float embeddings to merge (set RERANK_DIR)")
+
+        keep = np.flatnonzero(~main.deleted)
+        products = [main.product(row) for row in keep]
+        live = np.flatnonzero(~delta.deleted)
+        products += [delta.product(row) for row in live]
+        parts = [delta.embeddings[live]]
+        if len(keep):
+            parts.insert(0, np.asarray(main.embeddings[keep], dtype=np.float32))
+        merged = ProductCatalog(products, np.concatenate(parts), normalized=True)
+        return self.prepare(merged)
+
+    def status(self) -> dict:
+        segments = self._segments
+        return {
+            "generation": segments.generation,
+            "main_products": int(len(segments.main) - segments.main.deleted.sum()),
+            "delta_products": len(self._delta),
+            "merge_threshold": self.merge_threshold,
+            "merging": self.merging,
+            "last_merge": self.last_merge,
+        }
@@ -6,19 +6,48 @@ Vector similarity search for products using CLIP-like vision encoders
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from typing import List, Optional
 import os
 import logging
+import multiprocessing
+import asyncio
+import tempfile
 import numpy as np
 from datetime import datetime
 
+from ann_index import HNSWIndex, build_index
+from catalog import ProductCatalog
+from catalog_store import load_catalog
+from encoder_batcher import BatchingEncoder
+from embedding_cache import EmbeddingCache, url_key
+from filters import ProductFilter
+from ingestion import LiveCatalog
+
+import _paths  # puts shared/ on the import path in a source checkout
+from shared.analysis.design_analysis import DesignAnalyzer, DesignStore, analyze_images
+from shared.schemas.product import ProductCreate
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The disk tier only expires rows on lookup; clear out what other runs left behind
+    purged = await asyncio.to_thread(EMBEDDING_CACHE.purge_expired)
+    if purged:
+        logger.info(f"Purged {purged} expired embedding cache entries")
+    try:
+        yield
+    finally:
+        await ENCODER.close()
+
 app = FastAPI(
     title="Fashion Search Engine",
     description="Vector similarity search for fashion products",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -29,11 +58,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class SearchRequest(BaseModel):
-    imageUrl: str
+class SearchOptions(BaseModel):
     max_results: int = 20
     min_similarity: float = 0.7
     budget_filter: Optional[float] = None
+    # Pre-filters, applied before similarity scoring
+    categories: Optional[List[str]] = None
+    brands: Optional[List[str]] = None
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    in_stock_only: bool = False
+
+class SearchRequest(SearchOptions):
+    imageUrl: str
+
+class BatchSearchRequest(SearchOptions):
+    imageUrls: List[str]
+    merge_results: bool = False  # Also return one deduplicated list across all queries
 
 class Product(BaseModel):
     id: str
@@ -52,63 +93,72 @@ class SearchResponse(BaseModel):
     query_time: float
     total_matches: int
 
-# Placeholder for vision encoder
-# In production, this would use CLIP, OpenCLIP, or custom fine-tuned model
-def encode_image(image_url: str) -> np.ndarray:
-    """
-    Encode image to vector embedding using vision encoder
-    TODO: Integrate with CLIP or similar vision encoder
-    """
-    # Placeholder: Return random embedding
-    # In production:
-    # 1. Download image from URL
-    # 2. Preprocess image (resize, normalize)
-    # 3. Pass through vision encoder (CLIP)
-    # 4. Return embedding vector (512-1024 dimensions)
-    
-    return np.random.rand(512).astype(np.float32)
-
-def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
-    """Calculate cosine similarity between two vectors"""
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
-    return dot_product / (norm1 * norm2) if norm1 > 0 and norm2 > 0 else 0.0
-
-def calculate_product_score(
-    similarity: float,
-    price: float,
-    budget: Optional[float],
-    brand_score: float = 0.5,
-    availability: bool = True
-) -> float:
+class QueryResult(BaseModel):
+    imageUrl: str
+    products: List[Product]
+    total_matches: int
+
+class BatchSearchResponse(BaseModel):
+    results: List[QueryResult]
+    merged: Optional[List[Product]] = None
+    query_time: float
+
+class ProductUpsert(ProductCreate):
+    id: str
+
+class ProductUpdate(BaseModel):
+    id: str
+    price: Optional[float] = None
+    availability: Optional[bool] = None
+
+class IngestRequest(BaseModel):
+    upsert: List[ProductUpsert] = []
+    delete: List[str] = []
+    update: List[ProductUpdate] = []
+
+class IngestResponse(BaseModel):
+    upserted: int
+    deleted: int
+    updated: int
+    delta_products: int
+
+# Micro-batching front-end: concurrent requests share one batched forward pass
+# of the shared design-analysis models (embedding + structured features)
+ENCODER = BatchingEncoder(
+    analyze_images,
+    max_batch=int(os.getenv("ENCODER_MAX_BATCH", "16")),
+    max_wait_ms=float(os.getenv("ENCODER_MAX_WAIT_MS", "5")),
+    workers=int(os.getenv("ENCODER_WORKERS", "1"))
+)
+
+# Content-addressed design-analysis store; point atelier matching at the same
+# file so each design image is downloaded and analysed once for both services
+DESIGN_STORE = DesignStore(
+    os.getenv("DESIGN_STORE_PATH") or None,
+    max_entries=int(os.getenv("DESIGN_STORE_MAX_ENTRIES", "10000"))
+)
+DESIGN_ANALYZER = DesignAnalyzer(DESIGN_STORE, analyze=ENCODER.encode)
+
+# Query embedding cache: in-memory LRU + TTL, optional SQLite tier shared by workers
+EMBEDDING_CACHE = EmbeddingCache(
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "3600")),
+    disk_path=os.getenv("EMBEDDING_CACHE_DB") or None
+)
+
+async def get_query_embedding(image_url: str) -> np.ndarray:
     """
-    Calculate final product score using ranking formula:
-    score = α * cosine_similarity + β * price_alignment + γ * brand_score + δ * availability
+    Embed a query image, skipping the encoder on repeat queries.
+    Looks up the embedding cache by URL, then the shared design-analysis
+    store (by URL, then by content hash of the downloaded image).
     """
-    alpha = 0.6  # Similarity weight
-    beta = 0.2   # Price alignment weight
-    gamma = 0.1  # Brand score weight
-    delta = 0.1  # Availability weight
-    
-    # Price alignment (closer to budget = higher score)
-    if budget:
-        price_diff = abs(price - budget) / budget
-        price_alignment = max(0, 1 - price_diff)
-    else:
-        price_alignment = 0.5
-    
-    # Availability score
-    availability_score = 1.0 if availability else 0.0
+    embedding = await EMBEDDING_CACHE.get_async(url_key(image_url))
+    if embedding is not None:
+        return embedding
     
-    score = (
-        alpha * similarity +
-        beta * price_alignment +
-        gamma * brand_score +
-        delta * availability_score
-    )
-    
-    return score
+    analysis = await DESIGN_ANALYZER.analyze(image_url)
+    await EMBEDDING_CACHE.put_async(url_key(image_url), analysis.embedding)
+    return analysis.embedding
 
 # Mock product database
 # In production, this would be a vector database (Pinecone, Weaviate, Qdrant)
@@ -128,6 +178,84 @@ MOCK_PRODUCTS = [
     # Add more mock products...
 ]
 
+# On-disk catalog built with `python catalog_store.py build` (memory-mapped, shared by workers)
+CATALOG_PATH = os.getenv("CATALOG_PATH")
+
+# Approximate nearest-neighbour index: "exact" (brute force), "ivf" or "hnsw"
+ANN_INDEX = os.getenv("ANN_INDEX", "exact")
+# Number of ANN / compressed-scan candidates re-scored with the full ranking formula
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+# Embedding storage: "float32" (default), "int8" or "pq"
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+# Directory the float matrix is spilled to for exact re-ranking in compressed mode (empty = drop it)
+RERANK_DIR = os.getenv("RERANK_DIR", tempfile.gettempdir())
+# Delta segment size that triggers a background merge into the main catalog
+MERGE_THRESHOLD = int(os.getenv("MERGE_THRESHOLD", "10000"))
+
+def build_index_in_process(catalog: ProductCatalog, kind: str, **params) -> None:
+    """
+    Build the ANN index in a worker process: HNSW construction is pure
+    Python and would hold the GIL, stalling searches for the whole merge.
+    Spawned, not forked: this runs on the merge thread of a threaded server
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        catalog.index = pool.submit(build_index, kind, catalog.embeddings, **params).result()
+    if isinstance(catalog.index, HNSWIndex):
+        # Share the catalog's matrix instead of keeping the copy sent back by the worker
+        catalog.index.vectors = catalog.embeddings
+
+def prepare_catalog(catalog: ProductCatalog, in_process: bool = False) -> ProductCatalog:
+    """Apply the configured ANN index and compressed storage to a catalog"""
+    if len(catalog) == 0:
+        return catalog
+
+    if ANN_INDEX != "exact":
+        if ANN_INDEX == "ivf":
+            ann_params = {
+                "n_lists": int(os.getenv("ANN_NLIST", "256")),
+                "nprobe": int(os.getenv("ANN_NPROBE", "8")),
+            }
+        else:
+            ann_params = {
+                "M": int(os.getenv("ANN_M", "16")),
+                "ef_construction": int(os.getenv("ANN_EF_CONSTRUCTION", "100")),
+                "ef_search": int(os.getenv("ANN_EF_SEARCH", "64")),
+            }
+        if in_process:
+            build_index_in_process(catalog, ANN_INDEX, **ann_params)
+        else:
+            catalog.build_index(ANN_INDEX, **ann_params)
+
+    if EMBEDDING_STORAGE != "float32":
+        if ANN_INDEX != "exact":
+            logger.warning("ANN index keeps its own float vectors, compressed storage only applies to exact scans")
+        quantizer_params = {"n_subspaces": int(os.getenv("PQ_SUBSPACES", "64"))} if EMBEDDING_STORAGE == "pq" else {}
+        catalog.compress(EMBEDDING_STORAGE, rerank_dir=RERANK_DIR or None, **quantizer_params)
+        logger.info(f"Catalog vector storage: {catalog.memory_usage()}")
+
+    return catalog
+
+# Columnar view of the catalog used for scoring, plus the ingestion delta segment.
+# Ingested changes are held in this process only: run a single worker when using /ingest
+if CATALOG_PATH:
+    base_catalog = load_catalog(CATALOG_PATH)
+else:
+    base_catalog = ProductCatalog.from_records(MOCK_PRODUCTS)
+CATALOG = LiveCatalog(
+    prepare_catalog(base_catalog),
+    merge_threshold=MERGE_THRESHOLD,
+    prepare=lambda merged: prepare_catalog(merged, in_process=True)
+)
+
+def build_filter(request: SearchOptions) -> ProductFilter:
+    return ProductFilter(
+        categories=request.categories,
+        brands=request.brands,
+        price_min=request.price_min,
+        price_max=request.price_max,
+        in_stock_only=request.in_stock_only
+    )
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "search-engine"}
@@ -141,64 +269,138 @@ async def search_products(request: SearchRequest):
         start_time = datetime.now()
         
         # Encode query image
-        query_embedding = encode_image(request.imageUrl)
+        query_embedding = await get_query_embedding(request.imageUrl)
         logger.info(f"Encoded query image, embedding shape: {query_embedding.shape}")
         
-        # Calculate similarities
-        scored_products = []
-        
-        for product in MOCK_PRODUCTS:
-            similarity = cosine_similarity(query_embedding, product["embedding"])
-            
-            if similarity >= request.min_similarity:
-                score = calculate_product_score(
-                    similarity=similarity,
-                    price=product["price"],
-                    budget=request.budget_filter,
-                    brand_score=0.5,
-                    availability=product["availability"]
-                )
-                
-                scored_products.append({
-                    **product,
-                    "similarity": similarity,
-                    "score": score
-                })
-        
-        # Sort by score (descending)
-        scored_products.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Limit results
-        results = scored_products[:request.max_results]
+        # Score the whole catalog in one pass
+        results, total_matches = CATALOG.search(
+            query_embedding,
+            max_results=request.max_results,
+            min_similarity=request.min_similarity,
+            budget=request.budget_filter,
+            candidate_pool=SEARCH_CANDIDATES,
+            filters=build_filter(request)
+        )
         
         # Convert to Product models
-        products = [
-            Product(
-                id=p["id"],
-                name=p["name"],
-                category=p["category"],
-                price=p["price"],
-                image=p["image"],
-                url=p["url"],
-                brand=p.get("brand"),
-                rating=p.get("rating"),
-                similarity=p["similarity"],
-                availability=p["availability"]
-            )
-            for p in results
-        ]
+        products = [Product(**p) for p in results]
         
         query_time = (datetime.now() - start_time).total_seconds()
         
         return SearchResponse(
             products=products,
             query_time=query_time,
-            total_matches=len(scored_products)
+            total_matches=total_matches
         )
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_products_batch(request: BatchSearchRequest):
+    """
+    Search for several images at once: one batched encode,
+    one matrix-matrix product against the catalog
+    """
+    try:
+        start_time = datetime.now()
+        
+        # Encode all query images; concurrent misses share one encoder batch
+        image_urls = list(dict.fromkeys(request.imageUrls))
+        embeddings = await asyncio.gather(*(get_query_embedding(url) for url in image_urls))
+        logger.info(f"Encoded {len(image_urls)} query images")
+        
+        batch = CATALOG.search_batch(
+            np.stack(embeddings),
+            max_results=request.max_results,
+            min_similarity=request.min_similarity,
+            budget=request.budget_filter,
+            candidate_pool=SEARCH_CANDIDATES,
+            filters=build_filter(request)
+        )
+        by_url = dict(zip(image_urls, batch))
+        
+        results = [
+            QueryResult(
+                imageUrl=url,
+                products=[Product(**p) for p in by_url[url][0]],
+                total_matches=by_url[url][1]
+            )
+            for url in request.imageUrls
+        ]
+        
+        # Merged list: best score per product across all queries
+        merged = None
+        if request.merge_results:
+            best = {}
+            for products, _ in batch:
+                for p in products:
+                    if p["id"] not in best or p["score"] > best[p["id"]]["score"]:
+                        best[p["id"]] = p
+            ranked = sorted(best.values(), key=lambda p: p["score"], reverse=True)
+            merged = [Product(**p) for p in ranked[:request.max_results]]
+        
+        query_time = (datetime.now() - start_time).total_seconds()
+        
+        return BatchSearchResponse(
+            results=results,
+            merged=merged,
+            query_time=query_time
+        )
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Query embedding cache counters"""
+    return EMBEDDING_CACHE.stats()
+
+@app.get("/encoder/stats")
+async def encoder_stats():
+    """Encoder batching queue depth and batch size metrics"""
+    return ENCODER.stats()
+
+@app.get("/analysis/stats")
+async def analysis_stats():
+    """Shared design-analysis store hits, downloads and model runs"""
+    return await asyncio.to_thread(DESIGN_ANALYZER.stats)
+
+@app.post("/ingest", response_model=IngestResponse)
+async def ingest_products(request: IngestRequest):
+    """
+    Apply a batch of catalog changes: upserts go to the delta segment,
+    deletes tombstone products, price/availability updates apply in place.
+    Changes are visible to this worker process only (run a single worker).
+    """
+    try:
+        # Ingestion takes the writer lock and may build the product id lookup: keep it off the event loop
+        upserted = await asyncio.to_thread(CATALOG.upsert, [p.model_dump() for p in request.upsert])
+        deleted = await asyncio.to_thread(CATALOG.delete, request.delete)
+        updated = await asyncio.to_thread(CATALOG.update, [u.model_dump() for u in request.update])
+        logger.info(f"Ingested batch: {upserted} upserted, {deleted} deleted, {updated} updated")
+        
+        return IngestResponse(
+            upserted=upserted,
+            deleted=deleted,
+            updated=updated,
+            delta_products=CATALOG.status()["delta_products"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ingestion error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ingest/merge")
+async def merge_catalog():
+    """Merge the delta segment into the main catalog in the background"""
+    return {"started": CATALOG.maybe_merge(force=True), **CATALOG.status()}
+
+@app.get("/ingest/status")
+async def ingest_status():
+    return CATALOG.status()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
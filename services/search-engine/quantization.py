@@ -0,0 +1,155 @@
+"""
+Embedding Quantization
+Compressed storage for catalog embeddings with asymmetric distance computation (ADC):
+queries stay float32, only catalog vectors are compressed.
+
+- ScalarQuantizer: int8 per dimension (4x smaller than float32)
+- ProductQuantizer: M sub-vectors x 256 centroids, one uint8 code each
+  (512-dim float32 = 2048 bytes -> M bytes, e.g. 64 bytes = 32x smaller)
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per chunk, bounds temporaries created while decoding codes
+CHUNK_SIZE = 65536
+
+class Quantizer:
+    """Base class for embedding quantizers"""
+
+    name = "base"
+    dim = 0
+
+    def train(self, data: np.ndarray) -> "Quantizer":
+        return self
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner product between query and every encoded row"""
+        raise NotImplementedError
+
+    def bytes_per_vector(self) -> int:
+        raise NotImplementedError
+
+class ScalarQuantizer(Quantizer):
+    """Symmetric int8 quantization with a per-dimension scale"""
+
+    name = "int8"
+
+    def __init__(self):
+        self.scale = None
+
+    def train(self, data: np.ndarray) -> "ScalarQuantizer":
+        self.dim = data.shape[1]
+        max_abs = np.abs(data).max(axis=0)
+        max_abs[max_abs == 0] = 1.0
+        self.scale = (max_abs / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        codes = np.empty(data.shape, dtype=np.int8)
+        for start in range(0, len(data), CHUNK_SIZE):
+            chunk = data[start:start + CHUNK_SIZE] / self.scale
+            codes[start:start + len(chunk)] = np.clip(np.rint(chunk), -127, 127)
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # q · (c * s) == (q * s) · c, so the scale is folded into the query once
+        scaled_query = (query * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_SIZE):
+            chunk = codes[start:start + CHUNK_SIZE]
+            out[start:start + len(chunk)] = chunk.astype(np.float32) @ scaled_query
+        return out
+
+    def bytes_per_vector(self) -> int:
+        return self.dim
+
+class ProductQuantizer(Quantizer):
+    """
+    Product quantization: the vector is split into M sub-vectors and each is
+    replaced by the id of its nearest centroid (256 per sub-space).
+    """
+
+    name = "pq"
+
+    def __init__(self, n_subspaces: int = 64, n_iter: int = 20, train_size: int = 50_000, seed: int = 0):
+        self.n_subspaces = n_subspaces
+        self.n_centroids = 256
+        self.n_iter = n_iter
+        self.train_size = train_size
+        self.seed = seed
+        self.codebooks = None  # (M, 256, D / M)
+
+    def _split(self, data: np.ndarray) -> np.ndarray:
+        """(N, D) -> (M, N, D / M)"""
+        return data.reshape(len(data), self.n_subspaces, self.sub_dim).transpose(1, 0, 2)
+
+    def train(self, data: np.ndarray) -> "ProductQuantizer":
+        self.dim = data.shape[1]
+        if self.dim % self.n_subspaces != 0:
+            raise ValueError(f"Embedding dim {self.dim} is not divisible by {self.n_subspaces} sub-spaces")
+        self.sub_dim = self.dim // self.n_subspaces
+
+        rng = np.random.default_rng(self.seed)
+        if len(data) > self.train_size:
+            data = data[rng.choice(len(data), self.train_size, replace=False)]
+        data = np.asarray(data, dtype=np.float32)
+        n_centroids = min(self.n_centroids, len(data))
+
+        self.codebooks = np.zeros((self.n_subspaces, self.n_centroids, self.sub_dim), dtype=np.float32)
+        for m, sub in enumerate(self._split(data)):
+            centroids = sub[rng.choice(len(sub), n_centroids, replace=False)].copy()
+            for _ in range(self.n_iter):
+                assignment = self._nearest(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sub)
+                counts = np.bincount(assignment, minlength=n_centroids)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            self.codebooks[m, :n_centroids] = centroids
+
+        logger.info(f"Trained PQ codebooks: {self.n_subspaces} x {n_centroids} x {self.sub_dim}")
+        return self
+
+    @staticmethod
+    def _nearest(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||² == argmin (||c||² - 2 x·c)
+        distances = (centroids ** 2).sum(axis=1) - 2.0 * (sub @ centroids.T)
+        return np.argmin(distances, axis=1)
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(data), self.n_subspaces), dtype=np.uint8)
+        for start in range(0, len(data), CHUNK_SIZE):
+            chunk = np.asarray(data[start:start + CHUNK_SIZE], dtype=np.float32)
+            for m, sub in enumerate(self._split(chunk)):
+                codes[start:start + len(chunk), m] = self._nearest(sub, self.codebooks[m])
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Lookup table: inner product of each query sub-vector with each centroid
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.n_subspaces, self.sub_dim))
+        subspaces = np.arange(self.n_subspaces)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_SIZE):
+            chunk = codes[start:start + CHUNK_SIZE]
+            out[start:start + len(chunk)] = table[subspaces, chunk].sum(axis=1)
+        return out
+
+    def bytes_per_vector(self) -> int:
+        return self.n_subspaces
+
+QUANTIZER_TYPES = {
+    ScalarQuantizer.name: ScalarQuantizer,
+    ProductQuantizer.name: ProductQuantizer,
+}
+
+def build_quantizer(kind: str, data: np.ndarray, **params) -> Quantizer:
+    """Train a quantizer of the given kind ("int8" or "pq")"""
+    if kind not in QUANTIZER_TYPES:
+        raise ValueError(f"Unknown quantizer type: {kind}")
+    return QUANTIZER_TYPES[kind](**params).train(data)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Service modules are imported top-level, as they are when the service runs
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
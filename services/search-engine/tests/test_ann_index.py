@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from ann_index import HNSWIndex, IVFFlatIndex
+
+def clustered(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    points = centres[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+def recall_at_k(index, vectors: np.ndarray, queries: np.ndarray, k: int, allowed=None) -> float:
+    found = 0
+    for query in queries:
+        sims = vectors @ query
+        if allowed is not None:
+            sims = np.where(allowed, sims, -np.inf)
+        exact = set(np.argsort(-sims)[:k].tolist())
+        ids, _ = index.search(query, k, allowed=allowed)
+        found += len(exact & set(ids.tolist()))
+    return found / (k * len(queries))
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = clustered(2000, 32, 20, seed=0)
+    queries = clustered(30, 32, 20, seed=1)
+    return vectors, queries
+
+@pytest.fixture(scope="module")
+def hnsw(data):
+    return HNSWIndex(M=12, ef_construction=80, ef_search=64).build(data[0])
+
+def test_ivf_recall_matches_brute_force(data):
+    vectors, queries = data
+    index = IVFFlatIndex(n_lists=32, nprobe=8).build(vectors)
+    assert recall_at_k(index, vectors, queries, k=10) >= 0.9
+
+def test_ivf_probing_every_list_is_exact(data):
+    vectors, queries = data
+    index = IVFFlatIndex(n_lists=32, nprobe=32).build(vectors)
+    assert recall_at_k(index, vectors, queries, k=10) == 1.0
+
+def test_hnsw_recall_matches_brute_force(data, hnsw):
+    vectors, queries = data
+    assert recall_at_k(hnsw, vectors, queries, k=10) >= 0.9
+
+def test_hnsw_filtered_search_only_returns_allowed_rows(data, hnsw):
+    vectors, queries = data
+    allowed = np.zeros(len(vectors), dtype=bool)
+    allowed[::7] = True
+    for query in queries[:5]:
+        ids, sims = hnsw.search(query, 10, allowed=allowed)
+        assert allowed[ids].all()
+        assert np.all(np.diff(sims) <= 0)
+    assert recall_at_k(hnsw, vectors, queries, k=10, allowed=allowed) >= 0.9
+
+def test_search_on_empty_index():
+    index = HNSWIndex().build(np.empty((0, 8), dtype=np.float32))
+    ids, sims = index.search(np.ones(8, dtype=np.float32), 5)
+    assert ids.size == 0 and sims.size == 0
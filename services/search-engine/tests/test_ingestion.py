@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pytest
+
+from catalog import ProductCatalog
+from ingestion import LiveCatalog
+
+DIM = 16
+
+def product(product_id: str, embedding: np.ndarray, price: float = 100.0, **fields) -> dict:
+    return {
+        "id": product_id, "name": f"Product {product_id}", "category": "dress", "brand": "Brand",
+        "price": price, "availability": True, "embedding": embedding, **fields,
+    }
+
+def unit(rng: np.random.Generator) -> np.ndarray:
+    v = rng.normal(size=DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+def wait_for_merge(live: LiveCatalog) -> None:
+    deadline = time.monotonic() + 30
+    while live.merging and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not live.merging
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+@pytest.fixture
+def live(rng):
+    main = ProductCatalog.from_records([product(f"m{i}", unit(rng)) for i in range(50)])
+    return LiveCatalog(main, merge_threshold=1000)
+
+def ids(results) -> list:
+    return [p["id"] for p in results[0]]
+
+def test_upsert_is_searchable(live, rng):
+    embedding = unit(rng)
+    live.upsert([product("new", embedding)])
+    assert len(live) == 51
+    assert ids(live.search(embedding, 1, 0.0)) == ["new"]
+
+def test_upsert_replaces_main_and_delta_rows(live, rng):
+    main_row = live.segments.main.embeddings[3]
+    embedding = unit(rng)
+    live.upsert([product("m3", embedding, price=5.0)])
+    live.upsert([product("m3", embedding, price=7.0)])
+    assert len(live) == 50
+    results, _ = live.search(embedding, 50, -1.0)
+    assert [p["price"] for p in results if p["id"] == "m3"] == [7.0]
+    assert "m3" not in ids(live.search(main_row, 1, 0.99))
+
+def test_delete_hides_main_and_delta_products(live, rng):
+    embedding = unit(rng)
+    live.upsert([product("new", embedding)])
+    assert live.delete(["new", "m0", "missing"]) == 2
+    assert len(live) == 49
+    results, _ = live.search(embedding, 100, -1.0)
+    assert not {"new", "m0"} & {p["id"] for p in results}
+
+def test_update_patches_price_and_availability(live):
+    query = live.segments.main.embeddings[4]
+    assert live.update([{"id": "m4", "price": 42.0, "availability": False}, {"id": "missing", "price": 1.0}]) == 1
+    (top,), _ = live.search(query, 1, 0.0)
+    assert top["id"] == "m4" and top["price"] == 42.0 and top["availability"] is False
+
+def test_merge_folds_delta_into_main(live, rng):
+    embedding = unit(rng)
+    live.upsert([product("new", embedding)])
+    live.delete(["m1"])
+    live.update([{"id": "m2", "price": 9.0}])
+    assert live.maybe_merge(force=True)
+    wait_for_merge(live)
+
+    status = live.status()
+    assert status["generation"] == 1
+    assert status["delta_products"] == 0
+    assert status["main_products"] == len(live) == 50
+    assert ids(live.search(embedding, 1, 0.0)) == ["new"]
+    results, _ = live.search(embedding, 100, -1.0)
+    by_id = {p["id"]: p for p in results}
+    assert "m1" not in by_id and by_id["m2"]["price"] == 9.0
+
+def test_upsert_rejects_wrong_dimension(live):
+    with pytest.raises(ValueError):
+        live.upsert([product("bad", np.ones(DIM + 1, dtype=np.float32))])
+    assert len(live) == 50
+
+def test_empty_catalog_takes_dimension_from_first_upsert(rng):
+    live = LiveCatalog(ProductCatalog.from_records([]), merge_threshold=1000)
+    embedding = unit(rng)
+    live.upsert([product("first", embedding)])
+    assert ids(live.search(embedding, 1, 0.0)) == ["first"]
+    assert live.maybe_merge(force=True)
+    wait_for_merge(live)
+    assert live.status()["main_products"] == 1
+    assert ids(live.search(embedding, 1, 0.0)) == ["first"]
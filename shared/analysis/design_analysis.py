@@ -0,0 +1,283 @@
+"""
+Design Analysis
+One analysis stage for design images, shared by the search engine and
+atelier matching: each image is downloaded once, decoded once and run
+through the models once, producing both the embedding and the structured
+features (category, complexity, fabric, decorative elements).
+
+Results are kept in a content-addressed SQLite store (keyed by the sha256
+of the image bytes, with a URL -> hash map), bounded to the most recent
+`max_entries` analyses. Pointing both services at the same file (a shared
+volume) lets one read what the other computed. A short-lived claim row
+makes the second service wait for a running analysis instead of repeating
+it. Store calls run in worker threads, off the event loop.
+"""
+
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+
+class DesignAnalysis(NamedTuple):
+    content_hash: str
+    embedding: np.ndarray  # (EMBEDDING_DIM,) float32
+    features: dict  # category, complexity, fabric_type, decorative_elements
+
+def content_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def fetch_image(image_url: str) -> bytes:
+    """
+    Download design image bytes
+    TODO: Download with an HTTP client once real models are integrated
+    """
+    # Placeholder: the URL stands in for the image content
+    return image_url.encode("utf-8")
+
+# Placeholder for the vision models
+# In production: decode + preprocess once, one CLIP-like encoder forward pass,
+# and light classification heads (category, complexity, fabric, decorations)
+# on top of the shared image representation
+def embed_images(images: List[bytes]) -> np.ndarray:
+    """
+    Encode a batch of images to vector embeddings using vision encoder
+    TODO: Integrate with CLIP or similar vision encoder
+    """
+    # Placeholder: pseudo-random embeddings, stable per image content. Uniform
+    # in [0, 1) like the mock catalog's product embeddings, so placeholder
+    # queries score against it as before
+    embeddings = np.empty((len(images), EMBEDDING_DIM), dtype=np.float32)
+    for i, image in enumerate(images):
+        seed = int.from_bytes(hashlib.sha256(image).digest()[:8], "big")
+        embeddings[i] = np.random.default_rng(seed).random(EMBEDDING_DIM)
+    return embeddings
+
+def classify_embeddings(embeddings: np.ndarray) -> List[dict]:
+    """
+    Structured features from image embeddings
+    TODO: Replace with trained classification heads
+    """
+    # Placeholder: Return mock features
+    return [
+        {
+            "category": "dress",
+            "complexity": "medium",
+            "fabric_type": "satin",
+            "decorative_elements": ["embroidery", "beading"]
+        }
+        for _ in range(len(embeddings))
+    ]
+
+def analyze_images(images: List[bytes]) -> List[Tuple[np.ndarray, dict]]:
+    """Batched analysis: (embedding, features) per image from one encoder pass"""
+    embeddings = embed_images(images)
+    return list(zip(embeddings, classify_embeddings(embeddings)))
+
+class DesignStore:
+    """
+    Content-addressed analysis results in SQLite (WAL), safe to share
+    between processes. Without a path the store is private to the process.
+    Past `max_entries` analyses the oldest are evicted, with their URLs.
+    """
+
+    def __init__(self, path: Optional[str] = None, claim_ttl: float = 30.0, max_entries: int = 10000):
+        self.path = path or ":memory:"
+        self.claim_ttl = claim_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "content_hash TEXT PRIMARY KEY, embedding BLOB NOT NULL, features TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, content_hash TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS urls_hash ON urls (content_hash)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS claims (content_hash TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.entries = self._count()
+        self.evictions = 0
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def get_by_url(self, url: str) -> Optional[DesignAnalysis]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT a.content_hash, a.embedding, a.features FROM urls u "
+                "JOIN analyses a ON a.content_hash = u.content_hash WHERE u.url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return DesignAnalysis(row[0], np.frombuffer(row[1], dtype=np.float32), json.loads(row[2]))
+
+    def get(self, digest: str) -> Optional[DesignAnalysis]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding, features FROM analyses WHERE content_hash = ?", (digest,)
+            ).fetchone()
+        if row is None:
+            return None
+        return DesignAnalysis(digest, np.frombuffer(row[0], dtype=np.float32), json.loads(row[1]))
+
+    def put(self, analysis: DesignAnalysis) -> None:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (content_hash, embedding, features, created_at) VALUES (?, ?, ?, ?)",
+                (
+                    analysis.content_hash,
+                    np.asarray(analysis.embedding, dtype=np.float32).tobytes(),
+                    json.dumps(analysis.features, ensure_ascii=False),
+                    time.time()
+                )
+            )
+            self._conn.commit()
+            self.entries += cursor.rowcount
+            if self.entries > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes may share the file, so recount; evict down to 90% so
+        # eviction runs once per max_entries / 10 inserts, not on every one
+        self.entries = self._count()
+        excess = self.entries - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        digests = [
+            row[0] for row in self._conn.execute(
+                "SELECT content_hash FROM analyses ORDER BY created_at LIMIT ?", (excess,)
+            )
+        ]
+        self._conn.executemany("DELETE FROM analyses WHERE content_hash = ?", [(d,) for d in digests])
+        self._conn.executemany("DELETE FROM urls WHERE content_hash = ?", [(d,) for d in digests])
+        self._conn.commit()
+        self.entries -= len(digests)
+        self.evictions += len(digests)
+
+    def link_url(self, url: str, digest: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO urls (url, content_hash) VALUES (?, ?)", (url, digest))
+            self._conn.commit()
+
+    def try_claim(self, digest: str, owner: str) -> bool:
+        """Take the right to analyse `digest`, unless another owner holds a live claim"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM claims WHERE content_hash = ? AND expires_at < ?", (digest, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO claims (content_hash, owner, expires_at) VALUES (?, ?, ?)",
+                (digest, owner, now + self.claim_ttl)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def release(self, digest: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM claims WHERE content_hash = ? AND owner = ?", (digest, owner))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count()
+
+class DesignAnalyzer:
+    """
+    Async front-end to the analysis stage: URL -> stored result, else
+    download once, then content hash -> stored result, else analyse once.
+    Concurrent requests for a URL share one pipeline run.
+    """
+
+    def __init__(
+        self,
+        store: DesignStore,
+        analyze: Optional[Callable[[bytes], Awaitable[Tuple[np.ndarray, dict]]]] = None,
+        fetch: Callable[[str], bytes] = fetch_image,
+        poll_interval: float = 0.05
+    ):
+        self.store = store
+        # e.g. a micro-batching front-end; defaults to one-image batches in a thread
+        self.analyze_image = analyze or self._analyze_in_thread
+        self.fetch = fetch
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.url_hits = 0
+        self.content_hits = 0
+        self.fetches = 0
+        self.analyses = 0
+        self.waits = 0
+
+    @staticmethod
+    async def _analyze_in_thread(image: bytes) -> Tuple[np.ndarray, dict]:
+        return (await asyncio.to_thread(analyze_images, [image]))[0]
+
+    async def analyze(self, image_url: str) -> DesignAnalysis:
+        # SQLite calls may wait on another process's write lock: never on the event loop
+        analysis = await asyncio.to_thread(self.store.get_by_url, image_url)
+        if analysis is not None:
+            self.url_hits += 1
+            return analysis
+
+        future = self._inflight.get(image_url)
+        if future is None:
+            future = asyncio.ensure_future(self._run(image_url))
+            self._inflight[image_url] = future
+            future.add_done_callback(lambda _: self._inflight.pop(image_url, None))
+        return await asyncio.shield(future)
+
+    async def _run(self, image_url: str) -> DesignAnalysis:
+        image = await asyncio.to_thread(self.fetch, image_url)
+        self.fetches += 1
+        digest = content_hash(image)
+
+        waited = False
+        while True:
+            analysis = await asyncio.to_thread(self.store.get, digest)
+            if analysis is not None:
+                self.content_hits += 1
+                break
+            if await asyncio.to_thread(self.store.try_claim, digest, self.owner):
+                try:
+                    embedding, features = await self.analyze_image(image)
+                    analysis = DesignAnalysis(digest, np.asarray(embedding, dtype=np.float32), features)
+                    await asyncio.to_thread(self.store.put, analysis)
+                    self.analyses += 1
+                finally:
+                    await asyncio.to_thread(self.store.release, digest, self.owner)
+                break
+            # Another worker or service is analysing this image: wait for its result
+            if not waited:
+                waited = True
+                self.waits += 1
+            await asyncio.sleep(self.poll_interval)
+
+        await asyncio.to_thread(self.store.link_url, image_url, digest)
+        return analysis
+
+    def stats(self) -> dict:
+        return {
+            "stored_analyses": self.store.count(),
+            "max_entries": self.store.max_entries,
+            "evictions": self.store.evictions,
+            "inflight": len(self._inflight),
+            "url_hits": self.url_hits,
+            "content_hits": self.content_hits,
+            "fetches": self.fetches,
+            "analyses": self.analyses,
+            "claim_waits": self.waits,
+            "shared_store": self.store.path != ":memory:",
+        }
@@ -2,9 +2,49 @@
 Atelier Database Schema
 """
 
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
+import re
+
+DEFAULT_CURRENCY = "RUB"
+
+# Currency markers, checked in order against the lowercased price range
+CURRENCY_MARKERS = [
+    ("₽", "RUB"), ("руб", "RUB"), ("rub", "RUB"), ("р.", "RUB"),
+    ("$", "USD"), ("usd", "USD"),
+    ("€", "EUR"), ("eur", "EUR"),
+]
+
+# A number with optional thousands separators and a k/тыс suffix: "20 000", "1.5k", "30 тыс"
+_PRICE_NUMBER = re.compile(r"(\d+(?:[ \u00a0\u202f]\d{3})*(?:[.,]\d+)?)\s*(k|к|тыс\.?)?", re.IGNORECASE)
+_UPPER_ONLY = re.compile(r"^\s*(до|up to|to|<)", re.IGNORECASE)
+
+def parse_price_range(text: Optional[str]) -> Tuple[Optional[float], Optional[float], str]:
+    """
+    Parse a free-form price range into (min, max, currency).
+    "20000-50000 руб" -> (20000, 50000, "RUB"), "от 15 000 ₽" -> (15000, None, "RUB"),
+    "до 30k" -> (0, 30000, "RUB"). Unparseable input gives (None, None, currency).
+    """
+    lowered = (text or "").lower()
+    currency = next((code for marker, code in CURRENCY_MARKERS if marker in lowered), DEFAULT_CURRENCY)
+    values = []
+    for number, suffix in _PRICE_NUMBER.findall(lowered):
+        value = float(re.sub(r"[ \u00a0\u202f]", "", number).replace(",", "."))
+        values.append(value * 1000 if suffix else value)
+    if not values:
+        return None, None, currency
+    if len(values) == 1:
+        if _UPPER_ONLY.match(lowered):
+            return 0.0, values[0], currency
+        if "-" in lowered or "–" in lowered or "—" in lowered:
+            return values[0], values[0], currency
+        # "от 15000" / "from 15000" / bare number: open upper bound unless it is a fixed price
+        if re.match(r"^\s*(от|from|>)", lowered):
+            return values[0], None, currency
+        return values[0], values[0], currency
+    low, high = min(values[:2]), max(values[:2])
+    return low, high, currency
 
 class ContactInfo(BaseModel):
     phone: Optional[str] = None
@@ -16,8 +56,15 @@ class Atelier(BaseModel):
     id: str
     name: str
     location: str
+    # Falls back to the gazetteer centre of `location` when not given
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
     specialization: List[str]  # ["вечерние платья", "корсеты", etc.]
     priceRange: str  # "20000-50000 руб"
+    # Parsed from priceRange when not given; price_max None means open-ended
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    currency: str = DEFAULT_CURRENCY
     rating: float = Field(ge=0, le=5)
     portfolioImages: List[str]
     contact: Optional[ContactInfo] = None
@@ -26,9 +73,17 @@ class Atelier(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
+    @model_validator(mode="after")
+    def parse_price(self) -> "Atelier":
+        if self.price_min is None and self.price_max is None:
+            self.price_min, self.price_max, self.currency = parse_price_range(self.priceRange)
+        return self
+
 class AtelierCreate(BaseModel):
     name: str
     location: str
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
     specialization: List[str]
     priceRange: str
     portfolioImages: List[str]